@@ -0,0 +1,69 @@
+"""Measure the time and peak memory of exporting and importing the history.
+
+A history of --items small text items and --large pastes of --large-mb MB
+each is exported to a compressed archive, imported into a new database
+under a different key, then imported again, when every item is a
+duplicate. Peak memory is the Python allocation seen by tracemalloc; it
+should stay near a few chunks however large the history and its items
+are, since both directions stream.
+
+Run from the repository root:
+
+    python benchmarks/bench_archive.py [--items 10000] [--large 3] [--large-mb 50]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from common import isolate
+
+def measure(function, *args):
+    """Return (result, seconds, peak MB) of a call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--large", type=int, default=3)
+    parser.add_argument("--large-mb", type=int, default=50)
+    args = parser.parse_args()
+
+    home = isolate()
+
+    from encryption import ContentCipher
+    from secure_database import SecureDatabase
+    from settings_store import get_settings_store
+
+    settings = get_settings_store()
+    settings.set_value("max_history_size", args.items + args.large)
+    settings.set_value("max_item_size_mb", args.large_mb + 1)
+
+    db = SecureDatabase(os.path.join(home, "source.db"), ContentCipher(os.urandom(32)))
+    for number in range(args.items):
+        db.save_item("text", f"item {number}: kubectl apply -f deployment-{number % 97}.yaml --namespace dev")
+    line = "2024-05-01 12:00:00,123 INFO [worker] processed batch\tid=42 status=ok\n"
+    for number in range(args.large):
+        db.save_item("text", f"paste {number}\n" + line * (args.large_mb * 1024 * 1024 // len(line)))
+    db.index_pending()
+    print(f"history: {args.items} items and {args.large} pastes of {args.large_mb} MB")
+
+    path = os.path.join(home, "history.ccz")
+    count, elapsed, peak = measure(db.export_history, path)
+    print(f"export:    {elapsed:6.2f}s  peak={peak:6.1f}MB  {count} items, archive {os.path.getsize(path) / 1e6:.1f}MB")
+    db.close()
+
+    target = SecureDatabase(os.path.join(home, "target.db"), ContentCipher(os.urandom(32)))
+    for name in ("import", "reimport"):
+        (imported, skipped), elapsed, peak = measure(target.import_history, path)
+        print(f"{name + ':':10} {elapsed:6.2f}s  peak={peak:6.1f}MB  {imported} imported, {skipped} skipped")
+    target.close()
+
+if __name__ == "__main__":
+    main()
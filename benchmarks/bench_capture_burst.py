@@ -0,0 +1,116 @@
+"""Measure the CPU time and database writes a burst of clipboard changes costs.
+
+Each scenario sets the clipboard in a tight loop, the way IDEs, terminals
+and remote desktop clients can, and runs the event loop between changes:
+
+- burst: --changes changes back to back
+- loop: a change every --interval-ms for --seconds
+
+Each scenario runs on the same window with every change captured directly,
+as before captures were coalesced, then through CaptureThrottle with the
+default settings, then with no capture delay, so only the per-second
+ceiling applies. Reported are the process CPU time from the first
+change until the database worker is idle, the items saved, the changes
+counted as coalesced and dropped, and whether the last content set is the
+newest item in the history.
+
+Run from the repository root:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_capture_burst.py [--changes 500]
+"""
+import argparse
+import sys
+import time
+
+from common import isolate
+
+def run_events(app, seconds):
+    """Run the event loop for a while."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+
+def counters(metrics):
+    snapshot = metrics.snapshot()
+    return {
+        "saves": snapshot["latency"].get("db.save_item", {}).get("count", 0),
+        "coalesced": snapshot["counters"].get("clipboard.coalesced", 0),
+        "dropped": snapshot["counters"].get("clipboard.dropped", 0),
+    }
+
+def run_scenario(app, window, changes, interval):
+    """Set the clipboard to each text in changes; return what it cost."""
+    from capture_throttle import MAX_CAPTURE_DELAY_MS
+
+    before = counters(window.metrics)
+    started_cpu = time.process_time()
+    started = time.perf_counter()
+    for number, text in enumerate(changes):
+        window.clipboard.setText(text)
+        app.processEvents()
+        # Keep the given pace, without sleeping through the whole interval
+        while time.perf_counter() < started + (number + 1) * interval:
+            app.processEvents()
+            time.sleep(0.0005)
+    # The last capture follows once changes settle; then wait for the database
+    run_events(app, MAX_CAPTURE_DELAY_MS / 1000 + 0.2)
+    window.db.count_items().result()
+    app.processEvents()
+    cpu = time.process_time() - started_cpu
+
+    after = counters(window.metrics)
+    newest = window.db.get_history(1).result()
+    _, content = window.db.get_item(newest[0][0]).result()
+    return {
+        "cpu_ms": cpu * 1000,
+        **{name: after[name] - before[name] for name in after},
+        "kept last": bytes(content).decode() == changes[-1],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--changes", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=2)
+    parser.add_argument("--interval-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    isolate()
+
+    from PyQt5.QtWidgets import QApplication
+    from settings_store import DEFAULTS, get_settings_store
+
+    app = QApplication(sys.argv)
+    settings = get_settings_store()
+    settings.set_value("max_history_size", 100000)
+    import clipcache
+
+    window = clipcache.ClipCache()
+    run_events(app, 0.5)
+
+    scenarios = {
+        "burst": ([f"burst change {i} " * 20 for i in range(args.changes)], 0),
+        "loop": ([f"loop change {i} " * 20 for i in range(int(args.seconds * 1000 / args.interval_ms))],
+                 args.interval_ms / 1000),
+    }
+    print(f"{'scenario':18} {'changes':>8} {'cpu ms':>8} {'saves':>6} {'coalesced':>10} {'dropped':>8}  kept last")
+    window.clipboard.dataChanged.disconnect(window.on_clipboard_change)
+    window.clipboard.dataChanged.connect(window.capture_clipboard)
+    for mode in ("direct", "throttled", "no delay"):
+        if mode == "throttled":
+            window.clipboard.dataChanged.disconnect(window.capture_clipboard)
+            window.clipboard.dataChanged.connect(window.on_clipboard_change)
+        elif mode == "no delay":
+            settings.set_value("capture_delay_ms", 0)
+        for name, (changes, interval) in scenarios.items():
+            # Each run captures new text
+            changes = [f"{mode} {text}" for text in changes]
+            result = run_scenario(app, window, changes, interval)
+            print(f"{name + ' ' + mode:18} {len(changes):8} {result['cpu_ms']:8.0f} {result['saves']:6}"
+                  f" {result['coalesced']:10} {result['dropped']:8}  {result['kept last']}")
+    print(f"capture delay {DEFAULTS['capture_delay_ms']} ms, "
+          f"at most {DEFAULTS['max_captures_per_second']} captures per second")
+    window.close()
+
+if __name__ == "__main__":
+    main()
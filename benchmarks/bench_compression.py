@@ -0,0 +1,112 @@
+"""Benchmark database size and read latency for each available compression codec.
+
+Run from the repository root:
+
+    python benchmarks/bench_compression.py [--items 2000]
+
+The corpus mixes short snippets, log dumps, JSON, source code and PNG
+screenshots.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+from common import ensure_application, isolate
+
+def make_corpus(items, seed=0):
+    """Yield (content_type, content) pairs resembling real clipboard use."""
+    from PyQt5.QtCore import QByteArray, QBuffer, QIODevice
+    from PyQt5.QtGui import QImage, QPainter, QColor
+
+    rng = random.Random(seed)
+    levels = ("DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR")
+    modules = ("http.server", "db.pool", "auth", "scheduler", "cache", "worker")
+    source = open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "secure_database.py")).read()
+    for i in range(items):
+        kind = rng.random()
+        if kind < 0.45:
+            words = rng.choices(("the", "meeting", "link", "address", "thanks", "order", "ok", "see"), k=rng.randint(2, 30))
+            yield "text", " ".join(words) + f" {i}"
+        elif kind < 0.65:
+            lines = [f"2024-05-{rng.randint(1, 28):02d} 12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d},"
+                     f"{rng.randint(0, 999):03d} {rng.choice(levels)} [{rng.choice(modules)}] "
+                     f"request id={rng.randint(1000, 99999)} took {rng.random() * 900:.1f}ms"
+                     for _ in range(rng.randint(20, 400))]
+            yield "text", "\n".join(lines)
+        elif kind < 0.8:
+            records = [{"id": rng.randint(1, 10 ** 6), "name": f"user{rng.randint(1, 5000)}",
+                        "active": rng.random() < 0.5, "score": round(rng.random() * 100, 2),
+                        "tags": rng.sample(("a", "b", "c", "d", "e"), 2)} for _ in range(rng.randint(5, 200))]
+            yield "text", json.dumps(records, indent=2)
+        elif kind < 0.95:
+            start = rng.randrange(len(source) - 200)
+            yield "text", source[start:start + rng.randint(200, 8000)] + f"\n# {i}"
+        else:
+            image = QImage(rng.randint(200, 900), rng.randint(150, 600), QImage.Format_RGB32)
+            image.fill(QColor(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+            painter = QPainter(image)
+            for _ in range(40):
+                painter.fillRect(rng.randrange(image.width()), rng.randrange(image.height()), 60, 12,
+                                 QColor(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+            painter.end()
+            byte_array = QByteArray()
+            buffer = QBuffer(byte_array)
+            buffer.open(QIODevice.WriteOnly)
+            image.save(buffer, "PNG")
+            yield "image", byte_array.data()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    home = isolate()
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    ensure_application()
+
+    import compression
+    from secure_database import SecureDatabase
+    from settings_store import get_settings_store
+
+    settings = get_settings_store()
+    settings.set_value("max_history_size", args.items * 2)
+    settings.set_value("auto_clear", False)
+
+    corpus = list(make_corpus(args.items))
+    raw_bytes = sum(len(content if isinstance(content, bytes) else content.encode()) for _, content in corpus)
+    print(f"items={len(corpus)} raw={raw_bytes / 1e6:.1f}MB")
+
+    for codec in [compression.RAW] + sorted(compression.CODECS):
+        compression.DEFAULT_CODEC = codec
+        db = SecureDatabase(os.path.join(home, f"{codec}.db"))
+        start = time.perf_counter()
+        for content_type, content in corpus:
+            db.save_item(content_type, content)
+        save_rate = len(corpus) / (time.perf_counter() - start)
+
+        db.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        db.conn.execute('VACUUM')
+        size = os.path.getsize(db.db_path)
+        stored = db.conn.execute('SELECT SUM(length(content)) FROM content_blobs').fetchone()[0]
+
+        ids = [row[0] for row in db.conn.execute('SELECT id FROM clipboard_history')]
+        rng = random.Random(1)
+        latencies = []
+        for item_id in rng.choices(ids, k=args.reads):
+            start = time.perf_counter()
+            db.get_item(item_id)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(f"codec={codec:5} db={size / 1e6:6.1f}MB blobs={stored / 1e6:6.1f}MB saves={save_rate:7.0f}/s "
+              f"get_item p50={statistics.median(latencies) * 1e6:6.0f}us p95={p95 * 1e6:6.0f}us")
+        db.close()
+
+if __name__ == "__main__":
+    main()
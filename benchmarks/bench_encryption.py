@@ -0,0 +1,105 @@
+"""Compare capture and listing latency with and without encryption.
+
+Each mode captures the same clips into its own database, then lists the
+history the way the window does: get_history on the database worker, then
+HistoryModel.load and the display text of the rows that fit on screen.
+PlaintextCipher is the unencrypted path; ContentCipher is what is used
+whenever cryptography is installed. Search indexing runs after the
+captures, as the database worker does once its queue is drained, and is
+timed separately.
+
+Run from the repository root:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_encryption.py [--captures 3000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from common import ensure_application, isolate
+
+WORDS = ("Meeting tomorrow at 10am with the deployment team about kubectl apply and docker "
+         "network bridge config see https example com path to page for details invoice").split()
+
+# Rows a maximized history list shows without scrolling
+VISIBLE_ROWS = 40
+
+def make_clips(count, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 60))) + f" {i}" for i in range(count)]
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def list_history(db, model):
+    """List the history as the window does and format the visible rows."""
+    model.load(db.get_history())
+    for row in range(min(VISIBLE_ROWS, model.rowCount())):
+        model.index(row).data()
+
+def compare(databases, clips, repeat):
+    """Return {measurement: {mode: microseconds}}.
+
+    Modes take turns for every sample, so drift in machine load affects
+    both alike.
+    """
+    from history_model import HistoryModel
+
+    samples = {measurement: {name: [] for name in databases}
+               for measurement in ("capture", "listing", "open item", "index (background)")}
+    for clip in clips:
+        for name, db in databases.items():
+            samples["capture"][name].append(timed(db.save_item, "text", clip))
+    for name, db in databases.items():
+        start = time.perf_counter()
+        indexed = db.index_pending()
+        samples["index (background)"][name].append((time.perf_counter() - start) / max(indexed, 1))
+
+    models = {name: HistoryModel(lambda item_ids, callback: None, db.cipher.open_preview)
+              for name, db in databases.items()}
+    for _ in range(repeat):
+        for name, db in databases.items():
+            samples["listing"][name].append(timed(list_history, db, models[name]))
+            samples["open item"][name].append(timed(db.get_item, db.get_history(1)[0][0]))
+
+    return {measurement: {name: statistics.median(values) * 1e6 for name, values in by_mode.items()}
+            for measurement, by_mode in samples.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captures", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    home = isolate()
+
+    from encryption import AESGCM, ContentCipher, PlaintextCipher
+    from secure_database import SecureDatabase
+    from settings_store import get_settings_store
+
+    if AESGCM is None:
+        sys.exit("cryptography is not installed")
+    # HistoryModel builds status icons from the application style
+    ensure_application()
+    get_settings_store().set_value("max_history_size", args.captures)
+    clips = make_clips(args.captures)
+
+    databases = {name: SecureDatabase(os.path.join(home, f"{name}.db"), cipher)
+                 for name, cipher in (("plaintext", PlaintextCipher()),
+                                      ("encrypted", ContentCipher(os.urandom(32))))}
+    results = compare(databases, clips, args.repeat)
+    for db in databases.values():
+        db.close()
+
+    print(f"{'':20} {'plaintext':>10} {'encrypted':>10} {'overhead':>9}")
+    for measurement, by_mode in results.items():
+        plain, encrypted = by_mode["plaintext"], by_mode["encrypted"]
+        print(f"{measurement:20} {plain:8.1f}us {encrypted:8.1f}us {(encrypted / plain - 1) * 100:+8.1f}%")
+
+if __name__ == "__main__":
+    main()
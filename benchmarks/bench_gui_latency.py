@@ -0,0 +1,100 @@
+"""Measure GUI-thread stalls while a burst of large captures is saved.
+
+Compares calling SecureDatabase.save_item directly from a slot with posting
+the same captures to AsyncDatabase. A 1 ms timer runs on the GUI thread
+and every gap between its ticks is recorded; the longest gaps are how long
+the event loop was blocked.
+
+Run from the repository root:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_gui_latency.py [--count 10] [--size-mb 2]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from common import isolate
+
+def make_payloads(count, size_mb, seed=0):
+    """Build distinct large text captures."""
+    rng = random.Random(seed)
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+    payloads = []
+    for i in range(count):
+        line = " ".join(rng.choice(words) for _ in range(12)) + "\n"
+        payloads.append(f"capture {i}\n" + line * (size_mb * 1024 * 1024 // len(line)))
+    return payloads
+
+def run_burst(app, start_burst, is_done):
+    """Run the event loop through a burst and return the gaps between timer ticks in ms."""
+    from PyQt5.QtCore import QTimer
+
+    gaps = []
+    last_tick = [time.perf_counter()]
+
+    def tick():
+        now = time.perf_counter()
+        gaps.append((now - last_tick[0]) * 1000)
+        last_tick[0] = now
+        if is_done():
+            app.quit()
+
+    timer = QTimer()
+    timer.setInterval(1)
+    timer.timeout.connect(tick)
+    timer.start()
+    QTimer.singleShot(20, start_burst)
+    app.exec_()
+    timer.stop()
+    return gaps
+
+def report(label, gaps, elapsed):
+    gaps = sorted(gaps)
+    p99 = gaps[int(len(gaps) * 0.99) - 1] if gaps else 0
+    print(f"{label:>6}: max stall={gaps[-1]:8.1f}ms  p99={p99:7.1f}ms  burst time={elapsed:6.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--size-mb", type=int, default=2)
+    args = parser.parse_args()
+
+    home = isolate()
+
+    from PyQt5.QtWidgets import QApplication
+    from secure_database import SecureDatabase
+    from database_worker import AsyncDatabase
+
+    app = QApplication(sys.argv)
+    payloads = make_payloads(args.count, args.size_mb)
+
+    # Direct calls on the GUI thread, as clipboard slots used to make them
+    db = SecureDatabase(os.path.join(home, "sync.db"))
+    state = {"done": False}
+
+    def save_sync():
+        for payload in payloads:
+            db.save_item("text", payload)
+        state["done"] = True
+
+    start = time.perf_counter()
+    gaps = run_burst(app, save_sync, lambda: state["done"])
+    report("sync", gaps, time.perf_counter() - start)
+    db.close()
+
+    # The same burst posted to the database worker
+    async_db = AsyncDatabase(os.path.join(home, "async.db"))
+    futures = []
+
+    def save_async():
+        futures.extend(async_db.save_item("text", payload) for payload in payloads)
+
+    start = time.perf_counter()
+    gaps = run_burst(app, save_async, lambda: len(futures) == len(payloads) and all(f.done() for f in futures))
+    report("async", gaps, time.perf_counter() - start)
+    async_db.close()
+
+if __name__ == "__main__":
+    main()
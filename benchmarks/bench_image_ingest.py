@@ -0,0 +1,84 @@
+"""Measure GUI-thread stalls while 4K screenshots are captured.
+
+Compares PNG-encoding each image in the clipboard slot, as capture used to,
+with handing it to ImageIngest. Gaps between ticks of a 1 ms GUI timer are
+recorded as in bench_gui_latency.py, and the burst ends once every row is
+committed.
+
+Run from the repository root:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_image_ingest.py [--count 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from bench_gui_latency import run_burst, report
+from common import isolate
+
+def make_screenshot(seed, width=3840, height=2160):
+    """Draw a screenshot-like image: flat panels with lines of text."""
+    from PyQt5.QtGui import QImage, QPainter, QColor
+
+    rng = random.Random(seed)
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(QColor("white"))
+    painter = QPainter(image)
+    for _ in range(300):
+        painter.fillRect(rng.randrange(width), rng.randrange(height), rng.randint(20, 600), rng.randint(10, 300),
+                         QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    for y in range(0, height, 18):
+        painter.drawText(10, y, f"def capture_{seed}(argument): return something {y} " * 6)
+    painter.end()
+    return image
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5)
+    args = parser.parse_args()
+
+    home = isolate()
+
+    from PyQt5.QtWidgets import QApplication
+    from database_worker import AsyncDatabase
+    from image_ingest import ImageIngest
+    from thumbnails import encode_png
+
+    app = QApplication(sys.argv)
+    images = [make_screenshot(seed) for seed in range(args.count)]
+
+    def committed(db):
+        added = []
+        db.item_added.connect(added.append)
+        return lambda: len(added) == args.count
+
+    # PNG encoding in the clipboard slot, with the save already off the GUI thread
+    db = AsyncDatabase(os.path.join(home, "inline.db"))
+
+    def capture_inline():
+        for image in images:
+            db.save_item("image", encode_png(image))
+
+    start = time.perf_counter()
+    gaps = run_burst(app, capture_inline, committed(db))
+    report("inline", gaps, time.perf_counter() - start)
+    db.close()
+
+    # Hashing, encoding and thumbnailing on the ingest pool
+    db = AsyncDatabase(os.path.join(home, "ingest.db"))
+    ingest = ImageIngest(db)
+
+    def capture_ingest():
+        for image in images:
+            ingest.submit(image)
+
+    start = time.perf_counter()
+    gaps = run_burst(app, capture_ingest, committed(db))
+    report("ingest", gaps, time.perf_counter() - start)
+    ingest.shutdown()
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure peak memory and time to save and read back one very large paste.
+
+Peak memory is the extra Python allocation on top of the paste itself, as
+seen by tracemalloc; SQLite's own page cache is not included. For
+comparison, the legacy pipeline (per-character sanitize, encode, one BLOB)
+is measured on the same text without touching the database.
+
+Run from the repository root:
+
+    python benchmarks/bench_large_item.py [--size-mb 200]
+"""
+import argparse
+import time
+import tracemalloc
+
+from common import isolate
+
+def legacy_prepare(content):
+    """The copies save_item used to make before binding the BLOB."""
+    content = content.replace('\0', '')
+    content = ''.join(char for char in content if ord(char) >= 32 or char == '\n')
+    return content.encode()
+
+def measure(function, *args):
+    """Return (result, seconds, peak extra MB) of a call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--skip-legacy", action="store_true", help="the legacy pipeline needs several GB for 200 MB")
+    args = parser.parse_args()
+
+    isolate()
+
+    from secure_database import SecureDatabase
+    from settings_store import get_settings_store
+
+    line = "2024-05-01 12:00:00,123 INFO [worker] processed batch\tid=42 status=ok\n"
+    text = line * (args.size_mb * 1024 * 1024 // len(line))
+    print(f"paste={len(text) / 1e6:.0f}MB")
+
+    if not args.skip_legacy:
+        _, elapsed, peak = measure(legacy_prepare, text)
+        print(f"legacy prepare: {elapsed:6.2f}s  peak={peak:8.1f}MB")
+
+    get_settings_store().set_value("max_item_size_mb", args.size_mb + 1)
+    db = SecureDatabase()
+    item_id, elapsed, peak = measure(db.save_item, "text", text)
+    print(f"save_item:      {elapsed:6.2f}s  peak={peak:8.1f}MB")
+    _, elapsed, peak = measure(db.get_item, item_id)
+    print(f"get_item:       {elapsed:6.2f}s  peak={peak:8.1f}MB (the result itself is {len(text) / 1e6:.0f}MB)")
+    db.close()
+
+if __name__ == "__main__":
+    main()
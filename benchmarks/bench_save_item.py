@@ -0,0 +1,57 @@
+"""Benchmark SecureDatabase.save_item captures per second on a 10k-row history.
+
+Run from the repository root:
+
+    python benchmarks/bench_save_item.py [--rows 10000] [--captures 500]
+"""
+import argparse
+import sqlite3
+import time
+
+from common import isolate
+
+def seed_history(db_path, rows):
+    """Fill the history table with distinct text items, stored as older versions did."""
+    from secure_database import content_digest
+
+    conn = sqlite3.connect(db_path)
+    for i in range(rows):
+        content = f"seed item {i} ".encode() * 8
+        digest = content_digest(content)
+        conn.execute('INSERT INTO content_blobs (digest, content, size) VALUES (?, ?, ?)',
+                     (digest, content, len(content)))
+        conn.execute('INSERT INTO clipboard_history (content_type, content_digest) VALUES (?, ?)',
+                     ("text", digest))
+    conn.commit()
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--captures", type=int, default=500)
+    args = parser.parse_args()
+
+    isolate()
+
+    from secure_database import SecureDatabase
+    from settings_store import get_settings_store
+
+    # Keep the seeded rows; the history limit would otherwise trim them
+    settings = get_settings_store()
+    settings.set_value("max_history_size", args.rows + args.captures)
+    settings.set_value("auto_clear", True)
+
+    db = SecureDatabase()
+    seed_history(db.db_path, args.rows)
+
+    start = time.perf_counter()
+    for i in range(args.captures):
+        db.save_item("text", f"captured item {i} with some typical clipboard text")
+    elapsed = time.perf_counter() - start
+    db.close()
+
+    print(f"rows={args.rows} captures={args.captures} "
+          f"elapsed={elapsed:.3f}s rate={args.captures / elapsed:.1f} captures/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Measure sensitive-data scanner throughput in MB/s.
+
+Compares the combined single-pass scanner with the six separate
+re.search passes it replaced, on a large paste with nothing to find (the
+worst case, since nothing ends the scan early), then times a bulk re-scan
+of a stored history.
+
+Run from the repository root:
+
+    python benchmarks/bench_scanner.py [--size-mb 20] [--rows 20000]
+"""
+import argparse
+import random
+import re
+import time
+
+from common import isolate
+
+# The patterns SecureDatabase.is_sensitive_data searched for one by one
+LEGACY_PATTERNS = [
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    r'\b\d{16}\b',
+    r'\b\d{3}-\d{2}-\d{4}\b',
+    r'password|secret|key|token|credential',
+    r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b',
+    r'api[_-]?key|access[_-]?token|auth[_-]?token',
+]
+
+WORDS = ("The build of release 2024 finished in 12 minutes on runner 7 and uploaded "
+         "artifacts for Linux, Windows and macOS; Meeting notes: ship it Friday, v1.2.3").split()
+
+def make_text(size_mb, seed=0):
+    """Generate log-like text that matches none of the rules."""
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    while size < size_mb * 1024 * 1024:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16)))
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+def legacy_scan(text):
+    return any(re.search(pattern, text, re.IGNORECASE) for pattern in LEGACY_PATTERNS)
+
+def throughput(scan, text, repeat=3):
+    best = min(_timed(scan, text) for _ in range(repeat))
+    return len(text.encode()) / 1e6 / best
+
+def _timed(scan, text):
+    start = time.perf_counter()
+    scan(text)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    isolate()
+
+    from sensitive_scanner import RULES_VERSION, is_sensitive
+    from secure_database import SecureDatabase, content_digest
+
+    text = make_text(args.size_mb)
+    assert not is_sensitive(text) and not legacy_scan(text)
+    print(f"legacy six-pass: {throughput(legacy_scan, text):7.1f} MB/s")
+    print(f"combined:        {throughput(is_sensitive, text):7.1f} MB/s")
+
+    # Bulk re-scan, the way SensitiveScanner.rescan_history walks the history
+    db = SecureDatabase()
+    rng = random.Random(1)
+    with db.conn:
+        for i in range(args.rows):
+            content = (" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 200))) + f" {i}").encode()
+            digest = content_digest(content)
+            db.conn.execute('INSERT OR IGNORE INTO content_blobs (digest, content, size) VALUES (?, ?, ?)',
+                            (digest, content, len(content)))
+            db.conn.execute('INSERT INTO clipboard_history (content_type, content_digest) VALUES (?, ?)',
+                            ("text", digest))
+
+    scanned = 0
+    start = time.perf_counter()
+    while True:
+        item_ids = db.unscanned_items(RULES_VERSION, 200)
+        if not item_ids:
+            break
+        results = []
+        for item_id in item_ids:
+            content = db.get_item(item_id)[1]
+            scanned += len(content)
+            results.append((item_id, is_sensitive(content.decode("utf-8", errors="replace"))))
+        db.set_scan_results(results, RULES_VERSION)
+    elapsed = time.perf_counter() - start
+    print(f"bulk re-scan:    {scanned / 1e6 / elapsed:7.1f} MB/s ({args.rows} items in {elapsed:.2f}s)")
+    db.close()
+
+if __name__ == "__main__":
+    main()
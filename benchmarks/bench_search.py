@@ -0,0 +1,71 @@
+"""Benchmark SecureDatabase.search and fuzzy_search latency on a large text history.
+
+Fuzzy queries misspell words of the history the way users half-remember
+them; search runs them too, since it falls back to fuzzy_search when too
+few items match exactly.
+
+Run from the repository root:
+
+    python benchmarks/bench_search.py [--rows 100000]
+"""
+import argparse
+import random
+import time
+
+from common import isolate
+
+WORDS = ("docker run network bridge kubectl apply deployment python import "
+         "requests session commit branch merge rebase select from where join "
+         "invoice meeting tomorrow address street password config server").split()
+
+def make_corpus(rows, seed=0):
+    """Generate clipboard-like text with a Zipf-distributed vocabulary."""
+    rng = random.Random(seed)
+    vocabulary = WORDS + ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10)))
+                          for _ in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    for _ in range(rows):
+        yield " ".join(rng.choices(vocabulary, weights, k=rng.randint(5, 80)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    isolate()
+
+    from secure_database import SecureDatabase, content_digest
+
+    db = SecureDatabase()
+    with db.conn:
+        for text in make_corpus(args.rows):
+            content = text.encode()
+            digest = content_digest(content)
+            db.conn.execute('INSERT OR IGNORE INTO content_blobs (digest, content, size) VALUES (?, ?, ?)',
+                            (digest, content, len(content)))
+            db.conn.execute('INSERT INTO clipboard_history (content_type, content_digest) VALUES (?, ?)',
+                            ("text", digest))
+    # Encrypting the seeded rows also builds their search index
+    while db.encrypt_blobs(1000):
+        pass
+
+    for query in ("docker", "doc net", "kubectl apply deploy", "inv meet tomorrow"):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = db.search(query)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"rows={args.rows} query={query!r} results={len(results)} latency={elapsed * 1000:.2f}ms")
+    for query in ("dokcer", "dokcer netwrk", "kubctl aply deploymnt", "that docker command with --net",
+                  "invoise meting tomorow", "xylophone"):
+        for method in (db.fuzzy_search, db.search):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results = method(query)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(f"rows={args.rows} {method.__name__}={query!r} results={len(results)} "
+                  f"latency={elapsed * 1000:.2f}ms")
+    db.close()
+
+if __name__ == "__main__":
+    main()
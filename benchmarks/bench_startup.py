@@ -0,0 +1,68 @@
+"""Check the time from launch to the tray icon against a budget.
+
+Starts the application with --startup-profile several times, each in a new
+process, and reads its startup breakdown: the tray icon, the database, the
+main window and the first history load are timed from the first line of
+clipcache.py. The process is stopped once the history has loaded. Exits with
+status 1 if the median time to the tray icon is over --budget-ms.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--runs 10] [--budget-ms 250]
+
+Every run after the first opens the database the first one created.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from common import REPO_ROOT, home_env, temporary_home
+
+def profile_startup(env, timeout):
+    """Start the application once and return {phase: ms from launch}."""
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "clipcache.py"), "--startup-profile"],
+                               cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True)
+    phases = {}
+    try:
+        # Rows of "phase  ms  total ms" follow the header; history is the
+        # last. Anything printed before the header is startup messages.
+        for line in process.stdout:
+            if line.split()[:1] == ["phase"]:
+                break
+        for line in process.stdout:
+            *phase, _, total = line.split()
+            phases[" ".join(phase)] = float(total)
+            if phase == ["history"]:
+                break
+    finally:
+        process.kill()
+        process.wait(timeout)
+    if "history" not in phases:
+        sys.exit("clipcache.py exited without printing its startup profile")
+    return phases
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=250)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    env = dict(os.environ, **home_env(temporary_home()))
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    runs = [profile_startup(env, args.timeout) for _ in range(args.runs)]
+    print(f"{'phase':<14} {'median ms from launch':>22}")
+    for phase in runs[0]:
+        print(f"{phase:<14} {statistics.median(run[phase] for run in runs):22.1f}")
+
+    to_tray = statistics.median(run["tray"] for run in runs)
+    if to_tray > args.budget_ms:
+        sys.exit(f"time to tray {to_tray:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    print(f"time to tray {to_tray:.1f} ms is within the {args.budget_ms:.0f} ms budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Setup shared by the benchmark scripts.
+
+Every benchmark runs against a temporary HOME, so the real history and
+settings are never touched.
+"""
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Kept here so the application lives as long as the process
+_application = None
+
+def home_env(home):
+    """Return the environment variables that point the application at home."""
+    return {"HOME": home, "XDG_CONFIG_HOME": os.path.join(home, ".config")}
+
+def temporary_home():
+    """Create an empty home directory for a benchmark run."""
+    return tempfile.mkdtemp(prefix="clipcache-bench-")
+
+def isolate():
+    """Point this process at a temporary home, make the application importable and return the home."""
+    home = temporary_home()
+    os.environ.update(home_env(home))
+    sys.path.insert(0, REPO_ROOT)
+    return home
+
+def ensure_application():
+    """Create the QApplication for benchmarks that need Qt but never run its event loop."""
+    global _application
+    from PyQt5.QtWidgets import QApplication
+
+    if QApplication.instance() is None:
+        _application = QApplication(sys.argv)
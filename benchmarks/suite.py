@@ -0,0 +1,338 @@
+"""Time the database and history view hot paths and compare them with a baseline.
+
+SecureDatabase methods are timed on histories of each --sizes row count,
+and ClipCache.load_history and filter_history on a window over a mixed
+text and image history of --gui-rows rows. Histories are seeded in bulk,
+stored the way save_item stores them (encrypted, indexed, with
+thumbnails), since saving a million items one by one would take hours.
+
+Results are written as JSON. Each measurement is then compared with the
+same measurement in the baseline, and the run exits with status 1 if any
+median is more than --tolerance slower. Baselines depend on the machine:
+record one with --save-baseline before comparing.
+
+Runs headless on Linux; Windows-only imports are stubbed:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/suite.py [--sizes 1000,10000] [--save-baseline]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import time
+import types
+
+from common import isolate
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCHMARKS_DIR, "results.json")
+
+# Imported by ClipCache but unavailable, and not needed, on a headless Linux run
+STUBBED_MODULES = ("win32clipboard", "PIL", "PIL.Image")
+
+WORDS = ("docker run network bridge kubectl apply deployment python import requests "
+         "session commit branch merge rebase select from where join invoice meeting "
+         "tomorrow address street config server https example com path page").split()
+
+# Distinct texts the seeded history is built from; each row adds its own number
+TEMPLATES = 500
+
+# clear_history samples; each one restores the seeded history from a copy
+CLEAR_SAMPLES = 3
+
+# Differences smaller than this are noise, whatever the ratio
+MIN_REGRESSION_MS = 0.05
+
+def stub_modules():
+    """Insert empty modules for imports that can't be satisfied here."""
+    for name in STUBBED_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            sys.modules[name] = types.ModuleType(name)
+            parent, _, child = name.rpartition(".")
+            if parent:
+                setattr(sys.modules[parent], child, sys.modules[name])
+
+def make_thumbnails(count):
+    """Return (png_data, width, height) thumbnails of distinct solid images."""
+    from PyQt5.QtGui import QImage, QColor
+    from thumbnails import image_thumbnail
+
+    thumbnails = []
+    for i in range(count):
+        image = QImage(320, 200, QImage.Format_RGB32)
+        image.fill(QColor.fromHsv(i * 360 // count, 200, 200))
+        thumbnails.append(image_thumbnail(image))
+    return thumbnails
+
+def seed_history(db, rows, image_share, seed=0, batch_size=10000):
+    """Fill db with rows distinct items, newest last, as save_item would store them."""
+    from datetime import timedelta
+    from compression import compress
+    from secure_database import format_timestamp, text_preview, utc_now
+    from sensitive_scanner import RULES_VERSION
+
+    rng = random.Random(seed)
+    cipher = db.cipher
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 60))) for _ in range(TEMPLATES)]
+    bodies = [cipher.search_body(text) for text in texts]
+    trigram_bodies = [" ".join(cipher.trigram_tokens(text)) for text in texts]
+    thumbnails = make_thumbnails(16)
+    start = utc_now() - timedelta(seconds=rows)
+
+    blobs, items, index, trigrams, images = [], [], [], [], []
+
+    def flush():
+        with db.conn:
+            db.conn.executemany('INSERT INTO content_blobs (digest, content, size, codec, encrypted) VALUES (?, ?, ?, ?, ?)',
+                                blobs)
+            db.conn.executemany('''
+                INSERT INTO clipboard_history
+                    (id, content_type, content_digest, preview, size, timestamp, is_pinned, scan_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', items)
+            db.conn.executemany('INSERT INTO image_thumbnails (digest, width, height, data) VALUES (?, ?, ?, ?)', images)
+            if db.fts_enabled:
+                db.conn.executemany('INSERT INTO history_fts (rowid, body) VALUES (?, ?)', index)
+                db.conn.executemany('INSERT INTO history_trigrams (rowid, body) VALUES (?, ?)', trigrams)
+        for pending in (blobs, items, index, trigrams, images):
+            pending.clear()
+
+    for item_id in range(1, rows + 1):
+        timestamp = format_timestamp(start + timedelta(seconds=item_id))
+        template = rng.randrange(TEMPLATES)
+        if rng.random() < image_share:
+            content_type = "image"
+            data, width, height = thumbnails[template % len(thumbnails)]
+            # A distinct payload per row; only the thumbnail is ever decoded
+            content = data + item_id.to_bytes(8, "big")
+            preview = f"Image ({width}x{height})"
+        else:
+            content_type = "text"
+            text = f"{texts[template]} {item_id}"
+            content = text.encode()
+            preview = text_preview(text)
+        hasher = cipher.hasher()
+        hasher.update(content)
+        digest = hasher.digest()
+        codec, stored = compress(content)
+        blobs.append((digest, cipher.encrypt(stored, digest), len(content), codec, cipher.encrypts))
+        items.append((item_id, content_type, digest, cipher.seal_preview(preview), len(content), timestamp,
+                      rng.random() < 0.01, RULES_VERSION))
+        if content_type == "image":
+            images.append((digest, width, height, cipher.encrypt(data, b"thumbnail" + digest)
+                           if cipher.encrypts else data))
+        else:
+            index.append((item_id, f"{bodies[template]} {cipher.search_body(str(item_id))}"))
+            trigrams.append((item_id, " ".join([trigram_bodies[template], *cipher.trigram_tokens(str(item_id))])))
+        if len(items) == batch_size:
+            flush()
+    flush()
+
+def timings(function, args_list):
+    """Call function with each args tuple; return the durations in ms."""
+    durations = []
+    for args in args_list:
+        start = time.perf_counter()
+        function(*args)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+def summary(durations):
+    durations = sorted(durations)
+    return {
+        "median_ms": statistics.median(durations),
+        "p95_ms": durations[math.ceil(len(durations) * 0.95) - 1],
+        "samples": len(durations),
+    }
+
+def bench_database(home, rows, samples):
+    """Return {name: summary} for the SecureDatabase methods on a history of rows items."""
+    from secure_database import SecureDatabase
+    from settings_store import get_settings_store
+
+    settings = get_settings_store()
+    # Nothing expires or is trimmed while timing, except by enforce_history_limit
+    settings.set_value("auto_clear", False)
+    settings.set_value("max_history_size", rows + samples)
+
+    path = os.path.join(home, f"history-{rows}.db")
+    db = SecureDatabase(path)
+    cipher = db.cipher
+    start = time.perf_counter()
+    seed_history(db, rows, image_share=0.1)
+    db.close()
+    # clear_history empties the history, so each sample gets its own copy
+    seeded = path + ".seeded"
+    shutil.copyfile(path, seeded)
+    print(f"  seeded {rows} rows in {time.perf_counter() - start:.1f}s", flush=True)
+
+    db = SecureDatabase(path, cipher)
+
+    rng = random.Random(rows)
+    ids = [rng.randint(1, rows) for _ in range(samples)]
+    results = {}
+    results["save_item"] = summary(timings(db.save_item, [("text", f"benchmark capture {i} " * 4)
+                                                          for i in range(samples)]))
+    # Indexing the captures is background work, not part of any call below
+    db.index_pending()
+    results["get_history"] = summary(timings(db.get_history, [()] * max(samples // 4, 5)))
+    # Pages that start at random depths in the history, as scrolling lists them
+    cursors = db.cursor.execute(f"SELECT is_pinned, timestamp, id FROM clipboard_history "
+                                f"WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()
+    results["get_history_page"] = summary(timings(db.get_history_page, [(cursor,) for cursor in cursors]))
+    results["get_item"] = summary(timings(db.get_item, [(item_id,) for item_id in ids]))
+    # Misspelled queries, which only fuzzy search can match
+    queries = ["dokcer netwrk", "kubctl aply", "invoise meting", "pyhton imoprt"]
+    results["fuzzy_search"] = summary(timings(db.fuzzy_search, [(query,) for query in queries] * max(samples // 20, 1)))
+    results["toggle_pin"] = summary(timings(db.toggle_pin, [(item_id,) for item_id in ids]))
+    # Each call trims a few more of the oldest unpinned rows, at most half of
+    # them in all; limits start from the unpinned count so every call evicts
+    calls = max(samples // 4, 5)
+    unpinned = db._unpinned_count()
+    step = max(1, min(50, unpinned // (2 * calls)))
+    limits = [unpinned - step * (i + 1) for i in range(calls)]
+    results["enforce_history_limit"] = summary(timings(db.enforce_history_limit, [(limit,) for limit in limits]))
+    db.close()
+
+    durations = []
+    for _ in range(CLEAR_SAMPLES):
+        shutil.copyfile(seeded, path)
+        db = SecureDatabase(path, cipher)
+        durations += timings(db.clear_history, [()])
+        db.close()
+    results["clear_history"] = summary(durations)
+    os.remove(seeded)
+    return results
+
+def wait_for(signal, action):
+    """Run action and the event loop until signal is emitted; return the time taken in ms."""
+    from PyQt5.QtCore import QEventLoop
+
+    loop = QEventLoop()
+    signal.connect(loop.quit)
+    start = time.perf_counter()
+    action()
+    loop.exec_()
+    elapsed = (time.perf_counter() - start) * 1000
+    signal.disconnect(loop.quit)
+    return elapsed
+
+def settle(app, seconds=0.5):
+    """Let startup work queued on the database worker finish."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+
+def bench_window(app, rows, samples):
+    """Return {name: summary} for ClipCache.load_history and filter_history."""
+    from secure_database import SecureDatabase
+    from settings_store import get_settings_store
+
+    settings = get_settings_store()
+    settings.set_value("auto_clear", False)
+    settings.set_value("max_history_size", rows)
+    db = SecureDatabase()
+    seed_history(db, rows, image_share=0.2)
+    db.close()
+
+    import clipcache
+
+    window = clipcache.ClipCache()
+    settle(app)
+    model = window.history_model
+    results = {}
+    results["load_history"] = summary([wait_for(model.modelReset, window.load_history) for _ in range(samples)])
+
+    def search(query):
+        window.filter_history("")
+        return wait_for(window.search_model.modelReset, lambda: window.filter_history(query))
+
+    for query in ("docker", "meet tom", "kubectl apply deploy", "xylophone", "dokcer netwrk"):
+        results[f"filter_history[{query}]"] = summary([search(query) for _ in range(samples)])
+    window.close()
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print each measurement against the baseline; return the names that regressed."""
+    regressions = []
+    print(f"{'measurement':48} {'median':>10} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        median = result["median_ms"]
+        previous = baseline.get(name, {}).get("median_ms")
+        if previous is None:
+            print(f"{name:48} {median:8.3f}ms {'-':>10}")
+            continue
+        change = median / previous - 1 if previous else 0
+        regressed = change > tolerance and median - previous > MIN_REGRESSION_MS
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:48} {median:8.3f}ms {previous:8.3f}ms {change * 100:+7.1f}%{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="comma-separated history sizes for the database benchmarks")
+    parser.add_argument("--gui-rows", type=int, default=10000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    home = isolate()
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    stub_modules()
+
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+    results = {}
+    for rows in (int(size) for size in args.sizes.split(",") if size):
+        print(f"database, {rows} rows", flush=True)
+        for name, result in bench_database(home, rows, args.samples).items():
+            results[f"db.{name}@{rows}"] = result
+    if args.gui_rows:
+        print(f"window, {args.gui_rows} rows", flush=True)
+        for name, result in bench_window(app, args.gui_rows, max(args.samples // 20, 5)).items():
+            results[f"window.{name}@{args.gui_rows}"] = result
+
+    report = {
+        "machine": {"platform": platform.platform(), "python": platform.python_version()},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} measurement(s) regressed by more than {args.tolerance:.0%}:")
+        for name in regressions:
+            print(f"  {name}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
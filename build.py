@@ -23,6 +23,7 @@ def build_executable():
         "--icon=icon.ico",
         "--name=ClipCache",
         "--add-data=icon.ico;.",
+        "--add-data=schema.sql;.",
         "--hidden-import=PyQt5.QtCore",
         "--hidden-import=PyQt5.QtGui",
         "--hidden-import=PyQt5.QtWidgets",
@@ -0,0 +1,72 @@
+import hashlib
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, Qt
+from metrics import get_metrics
+
+# A burst that never pauses is still captured at least this often
+MAX_CAPTURE_DELAY_MS = 1000
+
+def text_digest(text):
+    """Return a digest identifying clipboard text, for spotting repeats."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+class CaptureThrottle(QObject):
+    """Coalesces bursts of clipboard changes into single captures.
+
+    changed() is connected to QClipboard.dataChanged and only restarts a
+    timer. capture() runs once no change has arrived for the
+    capture_delay_ms setting, so only the content the clipboard settled
+    on is read, or after MAX_CAPTURE_DELAY_MS of uninterrupted changes.
+    At most max_captures_per_second captures run in any second; one that
+    would exceed it waits, and the changes that arrive meanwhile are
+    counted as clipboard.dropped. Changes merged by the delay are counted
+    as clipboard.coalesced.
+    """
+    def __init__(self, capture, settings, parent=None):
+        super().__init__(parent)
+        self.capture = capture
+        self.settings = settings
+        self.metrics = get_metrics()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._capture_due)
+        self._pending_since = None  # when the first change not yet captured arrived
+        self._throttled = False
+        self._recent = deque()  # times of the captures in the last second
+
+    def changed(self):
+        """Note a clipboard change; the capture follows once changes settle."""
+        now = time.monotonic()
+        if self._pending_since is None:
+            self._pending_since = now
+        elif self._throttled:
+            self.metrics.increment("clipboard.dropped")
+        else:
+            self.metrics.increment("clipboard.coalesced")
+        if not self._throttled:
+            delay = min(self.settings.value("capture_delay_ms"),
+                        (self._pending_since - now) * 1000 + MAX_CAPTURE_DELAY_MS)
+            self.timer.start(max(int(delay), 0))
+
+    def cancel(self):
+        """Forget changes not yet captured, e.g. once the clipboard is set by ClipCache itself."""
+        self.timer.stop()
+        self._pending_since = None
+        self._throttled = False
+
+    def _capture_due(self):
+        now = time.monotonic()
+        while self._recent and self._recent[0] <= now - 1:
+            self._recent.popleft()
+        if len(self._recent) >= self.settings.value("max_captures_per_second"):
+            # Wait for the oldest capture to leave the one-second window
+            self._throttled = True
+            self.timer.start(max(int((self._recent[0] + 1 - now) * 1000) + 1, 0))
+            return
+
+        self._recent.append(now)
+        self._pending_since = None
+        self._throttled = False
+        self.capture()
@@ -0,0 +1,65 @@
+from PyQt5.QtCore import QByteArray, QMimeData
+from PyQt5.QtGui import QImage
+
+# Formats worth keeping besides the primary text or image, in the order they
+# are stored: rich text loses its formatting and a file list its files when
+# flattened to text. Qt names formats without a MIME type of their own, such
+# as RTF on Windows, by their native name.
+SECONDARY_FORMATS = (
+    "text/html",
+    "text/rtf",
+    "application/rtf",
+    'application/x-qt-windows-mime;value="Rich Text Format"',
+    "text/uri-list",
+)
+
+# Encoded images stored as the source offered them instead of encoding a PNG,
+# in order of preference. Only the first one offered is fetched, since each
+# fetch is a blocking transfer from the source, and PNG comes first as it is
+# lossless.
+ENCODED_IMAGE_FORMATS = ("image/png", "image/jpeg", "image/webp", "image/gif")
+
+# A secondary format larger than MAX_FORMAT_SIZE is left out, and so is any
+# that would take an item's secondary formats past MAX_FORMATS_SIZE
+MAX_FORMAT_SIZE = 1024 * 1024
+MAX_FORMATS_SIZE = 2 * 1024 * 1024
+
+def offered_formats(mime_data):
+    """Return the MIME types the clipboard content is offered in."""
+    return list(mime_data.formats())
+
+def secondary_formats(mime_data):
+    """Return {mime_type: data} of the secondary formats to store with a capture."""
+    offered = set(mime_data.formats())
+    formats = {}
+    total = 0
+    for mime_type in SECONDARY_FORMATS:
+        if mime_type not in offered:
+            continue
+        data = mime_data.data(mime_type).data()
+        if not data or len(data) > MAX_FORMAT_SIZE or total + len(data) > MAX_FORMATS_SIZE:
+            continue
+        formats[mime_type] = data
+        total += len(data)
+    return formats
+
+def encoded_image(mime_data):
+    """Return the preferred encoded image the source offered, or None."""
+    offered = set(mime_data.formats())
+    for mime_type in ENCODED_IMAGE_FORMATS:
+        if mime_type in offered:
+            return mime_data.data(mime_type).data() or None
+    return None
+
+def restore_mime_data(content_type, content, formats):
+    """Return QMimeData offering an item's primary content and its stored formats."""
+    mime_data = QMimeData()
+    if content_type == "text":
+        mime_data.setText(bytes(content).decode())
+    elif content_type == "image":
+        image = QImage()
+        image.loadFromData(bytes(content))
+        mime_data.setImageData(image)
+    for mime_type, data in formats.items():
+        mime_data.setData(mime_type, QByteArray(data))
+    return mime_data
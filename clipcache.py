@@ -1,63 +1,98 @@
 import sys
-import os
-from datetime import datetime
+import time
+
+# Taken before the other imports, so the startup profile includes them
+STARTED = time.perf_counter()
+
+import argparse
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QSystemTrayIcon, QMenu,
-                            QWidget, QVBoxLayout, QListWidget, QListWidgetItem,
-                            QAction, QStyle, QTabWidget, QLabel, QSpinBox,
-                            QCheckBox, QPushButton, QHBoxLayout, QLineEdit,
-                            QDialog, QFormLayout, QComboBox, QMessageBox, QGroupBox)
-from PyQt5.QtCore import Qt, QTimer, QSize, QByteArray, QBuffer, QIODevice, QPropertyAnimation, QEasingCurve, QPoint, QSettings
-from PyQt5.QtGui import QIcon, QPixmap, QClipboard, QImage, QColor
-import win32clipboard
-from PIL import Image
-import io
-from secure_database import SecureDatabase
-from theme_manager import ThemeManager
-from settings_dialog import SettingsDialog
+                            QWidget, QVBoxLayout, QListView, QAbstractItemView,
+                            QHBoxLayout, QLineEdit, QMessageBox, QFileDialog)
+from PyQt5.QtCore import Qt, QTimer
+from metrics import StartupProfile, get_metrics
+from settings_store import get_settings_store
 from icon import create_clipboard_icon
-from license_dialog import LicenseDialog
+from capture_throttle import CaptureThrottle, text_digest
+from clipboard_formats import encoded_image, offered_formats, restore_mime_data, secondary_formats
+from history_archive import open_archive, read_header
+from history_roles import ItemIdRole, PinnedRole
 
-class AnimatedListItem(QListWidgetItem):
-    def __init__(self, text, item_id, parent=None):
-        super().__init__(text, parent)
-        self.item_id = item_id
-        self.is_pinned = False
-        self.is_deleting = False
-        self.is_sensitive = False
+# The database, encryption and the modules that import them are imported
+# where they are first used, so the tray icon is shown without waiting for
+# them; history_roles lets the window use the model roles before that
 
 class ClipCache(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup=None):
         super().__init__()
+        # Timed for --startup-profile and the Diagnostics tab
+        self.startup = startup or StartupProfile()
         self.setWindowTitle("ClipCache")
         self.setMinimumSize(400, 600)
         
         # Set application icon
-        self.setWindowIcon(create_clipboard_icon())
+        self.icon = create_clipboard_icon()
+        self.setWindowIcon(self.icon)
         
         # Initialize clipboard monitoring
         self.clipboard = QApplication.clipboard()
-        self.last_clipboard_content = None
+        self.last_text_digest = None
         self.monitoring_paused = False
         self.is_copying_from_history = False  # Flag to prevent duplicate entries
+        self.search_query = ""
         
-        # Initialize secure database
-        self.db = SecureDatabase()
+        self.settings = get_settings_store()
+        self.metrics = get_metrics()
+        self.metrics.enabled = self.settings.value("collect_metrics")
+        
+        # The tray icon comes first; its actions only run once the event loop does
+        self.setup_system_tray()
+        self.startup.mark("tray")
+        
+        # Initialize the secure database; all database work runs on its
+        # worker thread and results come back through callbacks
+        from database_worker import AsyncDatabase
+        from expiry_scheduler import ExpiryScheduler
+        from image_ingest import ImageIngest
+        from sensitive_scanner import SensitiveScanner
+        self.db = AsyncDatabase(parent=self)
+        self.image_ingest = ImageIngest(self.db)
+        self.scanner = SensitiveScanner(self.db)
+        self.startup.mark("database")
         
         # Setup UI
         self.setup_ui()
-        self.setup_system_tray()
+        self.setup_metrics()
         
-        # Start clipboard monitoring
+        # Start clipboard monitoring; bursts of changes are captured once
+        self.capture_throttle = CaptureThrottle(self.capture_clipboard, self.settings, self)
         self.clipboard.dataChanged.connect(self.on_clipboard_change)
         
-        # Load settings
+        # Load settings, including the initial window flags
         self.load_settings()
+        self.startup.mark("window")
         
-        # Apply initial window flags based on settings
-        self.update_window_flags()
+        # Purge auto-cleared items as each one expires
+        self.expiry_scheduler = ExpiryScheduler(self.db, self.settings, self)
+        
+        # React to settings saved from the settings dialog
+        self.settings.changed.connect(self.on_setting_changed)
         
-        # Setup auto-clear timer
-        self.setup_auto_clear_timer()
+        # The history and background maintenance wait for the event loop,
+        # so the window is shown before any of it
+        QTimer.singleShot(0, self.start_background_work)
+        
+    def start_background_work(self):
+        """Load the history and start maintenance once the event loop runs."""
+        self.startup.mark("event loop")
+        self.load_history()
+        
+        self.expiry_scheduler.start()
+        
+        # Encrypt and compress payloads stored by older versions, a batch at a time
+        self.encrypt_stored_items()
+        
+        # Scan items stored before the current sensitive-data rules
+        self.scanner.rescan_history()
         
     def setup_ui(self):
         # Main widget and layout
@@ -76,21 +111,34 @@ class ClipCache(QMainWindow):
         search_layout.addWidget(self.search_input)
         layout.addLayout(search_layout)
         
+        # History model, kept up to date by row deltas from the database;
+        # further pages are listed as the view is scrolled
+        from history_model import HistoryModel, SearchResultsModel, SnippetDelegate
+        self.history_model = HistoryModel(self.db.get_thumbnails, self.db.cipher.open_preview,
+                                          self.load_history_page, self)
+        self.db.item_added.connect(self.history_model.add_row)
+        self.db.item_updated.connect(self.history_model.update_row)
+        self.db.items_removed.connect(self.history_model.remove_ids)
+        
+        # Search results replace the history in the list while a query is entered
+        self.search_model = SearchResultsModel(self)
+        self.db.item_updated.connect(self.search_model.update_row)
+        self.db.items_removed.connect(self.search_model.remove_ids)
+        
         # History list
-        self.history_list = QListWidget()
-        self.history_list.setSelectionMode(QListWidget.ExtendedSelection)  # Enable multi-select
-        self.history_list.itemClicked.connect(self.copy_to_clipboard)
+        self.history_list = QListView()
+        self.history_list.setModel(self.history_model)
+        self.history_list.setItemDelegate(SnippetDelegate(self.history_list))
+        self.history_list.setSelectionMode(QAbstractItemView.ExtendedSelection)  # Enable multi-select
+        self.history_list.clicked.connect(self.copy_to_clipboard)
         self.history_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.history_list.customContextMenuRequested.connect(self.show_context_menu)
         self.history_list.setSpacing(4)  # Add spacing between items
         layout.addWidget(self.history_list)
         
-        # Load initial history
-        self.load_history()
-        
     def setup_system_tray(self):
         self.tray_icon = QSystemTrayIcon(self)
-        self.tray_icon.setIcon(create_clipboard_icon())
+        self.tray_icon.setIcon(self.icon)
         
         # Create tray menu
         self.tray_menu = QMenu()
@@ -105,6 +153,12 @@ class ClipCache(QMainWindow):
         clear_action = self.tray_menu.addAction("Clear History")
         clear_action.triggered.connect(self.clear_history)
         
+        export_action = self.tray_menu.addAction("Export History...")
+        export_action.triggered.connect(self.export_history)
+        
+        import_action = self.tray_menu.addAction("Import History...")
+        import_action.triggered.connect(self.import_history)
+        
         settings_action = self.tray_menu.addAction("Settings")
         settings_action.triggered.connect(self.show_settings)
         
@@ -119,115 +173,109 @@ class ClipCache(QMainWindow):
         self.tray_icon.setContextMenu(self.tray_menu)
         self.tray_icon.show()
         
+    def setup_metrics(self):
+        """Register the gauges shown in the Diagnostics tab."""
+        self.metrics.set_gauge("db.size_bytes", self.db.file_size)
+        self.metrics.set_gauge("history.pixmap_bytes", self.history_model.pixmap_bytes)
+        # Counting rows is a query, so it is answered by the database worker
+        self.metrics.add_refresher(
+            lambda: self.db.count_items(callback=lambda count: self.metrics.set_gauge("db.rows", count)))
+        
     def on_clipboard_change(self):
+        self.metrics.increment("clipboard.changes")
         if self.monitoring_paused or self.is_copying_from_history:
+            # Whatever was pending has been replaced on the clipboard
+            self.capture_throttle.cancel()
+            self.metrics.increment("clipboard.ignored")
             return
+        self.capture_throttle.changed()
+        
+    def capture_clipboard(self):
+        """Save the clipboard content once a burst of changes has settled.
+        
+        Text or an image is the primary content; rich text and file lists
+        offered along with it are stored as secondary formats.
+        """
+        with self.metrics.timer("capture_clipboard"):
+            # Get clipboard content
+            mime_data = self.clipboard.mimeData()
             
-        # Get clipboard content
-        mime_data = self.clipboard.mimeData()
-        
-        if mime_data.hasText():
-            content = mime_data.text()
-            if content != self.last_clipboard_content:
-                self.db.save_item("text", content)
-                self.last_clipboard_content = content
-                self.load_history()  # Reload history after saving
-        elif mime_data.hasImage():
-            image = self.clipboard.image()
-            if image:
-                byte_array = QByteArray()
-                buffer = QBuffer(byte_array)
-                buffer.open(QIODevice.WriteOnly)
-                image.save(buffer, "PNG")
-                if byte_array != self.last_clipboard_content:
-                    self.db.save_item("image", byte_array.data())
-                    self.last_clipboard_content = byte_array.data()
-                    self.load_history()  # Reload history after saving
+            if mime_data.hasText():
+                content = mime_data.text()
+                # Compared by digest, so large text isn't kept around for the next change
+                digest = text_digest(content)
+                if digest != self.last_text_digest:
+                    # Sensitive data is flagged once the scanner has looked at it
+                    self.db.save_item("text", content, formats=secondary_formats(mime_data),
+                                      offered_formats=offered_formats(mime_data),
+                                      callback=lambda item_id: self.scanner.scan_item(item_id, content))
+                    self.last_text_digest = digest
+                    self.image_ingest.forget_last()
+                    self.metrics.increment("clipboard.text_captured")
+                else:
+                    self.metrics.increment("clipboard.repeated")
+            elif mime_data.hasImage():
+                image = self.clipboard.image()
+                if not image.isNull():
+                    # Repeats are detected and new images encoded off the GUI thread
+                    self.image_ingest.submit(image, encoded_image(mime_data), secondary_formats(mime_data),
+                                             offered_formats(mime_data))
+                    self.last_text_digest = None
+                    self.metrics.increment("clipboard.image_submitted")
                     
     def load_history(self):
-        self.history_list.clear()
-        items = self.db.get_history()
-        
-        for item_id, content_type, content, timestamp, is_pinned, is_sensitive, expiration_time in items:
-            if content_type == "text":
-                preview = content[:100].decode() + "..." if len(content) > 100 else content.decode()
-            else:  # Image
-                try:
-                    # Create thumbnail from image data
-                    image = QImage()
-                    image.loadFromData(content)
-                    
-                    # Create a scaled pixmap for the thumbnail
-                    pixmap = QPixmap.fromImage(image)
-                    scaled_pixmap = pixmap.scaled(64, 64, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    
-                    # Create a widget to hold the thumbnail and text
-                    item_widget = QWidget()
-                    layout = QHBoxLayout(item_widget)
-                    layout.setContentsMargins(4, 4, 4, 4)
-                    
-                    # Add thumbnail
-                    thumbnail_label = QLabel()
-                    thumbnail_label.setPixmap(scaled_pixmap)
-                    layout.addWidget(thumbnail_label)
-                    
-                    # Add image info
-                    info_label = QLabel(f"Image ({image.width()}x{image.height()})")
-                    layout.addWidget(info_label)
-                    
-                    # Create list item
-                    item = AnimatedListItem("", item_id)
-                    item.is_pinned = bool(is_pinned)
-                    item.is_sensitive = bool(is_sensitive)
-                    
-                    # Set icon based on content type and pinned status
-                    if is_pinned:
-                        item.setIcon(self.style().standardIcon(QStyle.SP_DialogSaveButton))
-                    elif is_sensitive:
-                        item.setIcon(self.style().standardIcon(QStyle.SP_MessageBoxWarning))
-                    else:
-                        item.setIcon(self.style().standardIcon(QStyle.SP_FileDialogDetailedView))
-                    
-                    # Set the custom widget
-                    self.history_list.addItem(item)
-                    self.history_list.setItemWidget(item, item_widget)
-                    continue
-                except Exception as e:
-                    print(f"Error loading image: {e}")
-                    preview = "[Image]"
+        """Reload the first page of the history; later changes arrive as row deltas."""
+        started = time.perf_counter()
+        self.db.get_history_page(callback=lambda rows: self.show_history(rows, started))
+        
+    def load_history_page(self, before, callback):
+        """List the page of history that follows before, for the history model."""
+        self.db.get_history_page(before, callback=callback)
+        
+    def show_history(self, rows, started):
+        """Load the first page of the history into the history model."""
+        self.history_model.load(rows)
+        # From the request to the rows being in the model
+        self.metrics.observe("load_history", time.perf_counter() - started)
+        if not self.startup.finished:
+            self.startup.mark("history")
+            self.startup.finish()
             
-            # Handle text items or failed image loads
-            item = AnimatedListItem(preview, item_id)
-            item.is_pinned = bool(is_pinned)
-            item.is_sensitive = bool(is_sensitive)
+    def encrypt_stored_items(self, processed=None):
+        """Queue batches of encrypt_blobs until no plaintext blobs are left, then recompress."""
+        if processed != 0:
+            self.db.encrypt_blobs(callback=self.encrypt_stored_items)
+        else:
+            self.recompress_stored_items()
             
-            # Set icon based on content type and pinned status
-            if is_pinned:
-                item.setIcon(self.style().standardIcon(QStyle.SP_DialogSaveButton))
-            elif is_sensitive:
-                item.setIcon(self.style().standardIcon(QStyle.SP_MessageBoxWarning))
-            elif content_type == "text":
-                item.setIcon(self.style().standardIcon(QStyle.SP_FileIcon))
-            else:
-                item.setIcon(self.style().standardIcon(QStyle.SP_FileDialogDetailedView))
-                
-            self.history_list.addItem(item)
+    def recompress_stored_items(self, processed=None):
+        """Queue batches of recompress_blobs until no uncompressed blobs are left."""
+        if processed != 0:
+            self.db.recompress_blobs(callback=self.recompress_stored_items)
             
-    def copy_to_clipboard(self, item):
-        if not isinstance(item, AnimatedListItem):
+    def copy_to_clipboard(self, index):
+        item_id = index.data(ItemIdRole)
+        if item_id is None:
             return
             
-        content_type, content = self.db.get_item(item.item_id)
+        started = time.perf_counter()
+        self.db.get_item(item_id, callback=lambda item: self.db.get_formats(
+            item_id, callback=lambda formats: self.copy_fetched_item(item, formats, started)))
+        
+    def copy_fetched_item(self, item, formats, started):
+        """Put a clicked item on the clipboard once it and its formats have been fetched."""
+        self.set_clipboard_content(item, formats)
+        # From the click to the content being on the clipboard
+        self.metrics.observe("copy_to_clipboard", time.perf_counter() - started)
+        
+    def set_clipboard_content(self, item, formats):
+        """Put an item fetched from the database on the clipboard, with its secondary formats."""
+        content_type, content = item
         if content:
             # Set flag to prevent duplicate entry
             self.is_copying_from_history = True
             
-            if content_type == "text":
-                self.clipboard.setText(content.decode())
-            elif content_type == "image":
-                image = QImage()
-                image.loadFromData(content)
-                self.clipboard.setImage(image)
+            self.clipboard.setMimeData(restore_mime_data(content_type, content, formats))
                 
             # Reset flag after a short delay to ensure clipboard change event has been processed
             QTimer.singleShot(100, self.reset_copying_flag)
@@ -237,9 +285,20 @@ class ClipCache(QMainWindow):
         self.is_copying_from_history = False
                 
     def filter_history(self, text):
-        for i in range(self.history_list.count()):
-            item = self.history_list.item(i)
-            item.setHidden(text.lower() not in item.text().lower())
+        """Show ranked search results, close matches included, or the full history when the query is empty."""
+        self.search_query = text
+        if text.strip():
+            self.db.search(text, callback=lambda rows: self.show_search_results(text, rows))
+        elif self.history_list.model() is not self.history_model:
+            self.history_list.setModel(self.history_model)
+            
+    def show_search_results(self, text, rows):
+        """Show the results of a search, unless the query has changed since."""
+        if text != self.search_query:
+            return
+        self.search_model.load(rows)
+        if self.history_list.model() is not self.search_model:
+            self.history_list.setModel(self.search_model)
             
     def toggle_monitoring(self):
         self.monitoring_paused = not self.monitoring_paused
@@ -252,26 +311,66 @@ class ClipCache(QMainWindow):
     def clear_history(self):
         """Clear all unpinned items from history."""
         self.db.clear_history()
+        
+    def export_history(self):
+        """Write the history to an archive the user picks."""
+        path, _ = QFileDialog.getSaveFileName(None, "Export History", "clipcache-history.ccz",
+                                              "ClipCache history archives (*.ccz)")
+        if not path:
+            return
+        self.db.export_history(path, callback=lambda count: self.tray_icon.showMessage(
+            "ClipCache", f"Exported {count} items", QSystemTrayIcon.Information, 2000))
+        
+    def import_history(self):
+        """Add the items of an archive the user picks to the history."""
+        path, _ = QFileDialog.getOpenFileName(None, "Import History", "",
+                                              "ClipCache history archives (*.ccz);;All files (*)")
+        if not path:
+            return
+        # Catch the wrong file here; errors further in are reported by the database
+        try:
+            with open_archive(path, "rb") as archive:
+                read_header(archive)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(None, "Import History", f"Could not import {path}: {e}")
+            return
+        self.db.import_history(path, callback=self.history_imported)
+        
+    def history_imported(self, result):
+        imported, skipped = result
         self.load_history()
+        # Imported rows are stored unscanned, like new captures
+        self.scanner.rescan_history()
+        self.tray_icon.showMessage(
+            "ClipCache",
+            f"Imported {imported} items" + (f", skipped {skipped} already in the history" if skipped else ""),
+            QSystemTrayIcon.Information,
+            2000
+        )
         
     def show_settings(self):
+        # Changes are applied by on_setting_changed as the dialog saves them
+        from settings_dialog import SettingsDialog
         dialog = SettingsDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
+        dialog.exec_()
+        
+    def on_setting_changed(self, key, value):
+        """Apply a setting that was changed through the settings store."""
+        if key == "theme":
             # Apply theme if changed
-            new_theme = dialog.theme.currentText()
-            if new_theme != self.theme_manager.get_current_theme():
-                self.theme_manager.apply_theme(new_theme)
-            # Update window flags if always-on-top setting changed
+            if value != self.theme_manager.get_current_theme():
+                self.theme_manager.apply_theme(value)
+        elif key == "force_to_front":
             self.update_window_flags()
-            # Enforce history limit if it was changed
-            self.db.enforce_history_limit(dialog.history_size.value())
-            # Reload history to reflect any changes
-            self.load_history()
-            # Update auto-clear timer interval if needed
-            self.update_auto_clear_timer()
+        elif key == "max_history_size":
+            # Enforce the new limit; trimmed rows are removed from the view
+            self.db.enforce_history_limit(value)
+        elif key == "collect_metrics":
+            self.metrics.enabled = value
         
     def load_settings(self):
         # Initialize theme manager
+        from theme_manager import ThemeManager
         self.theme_manager = ThemeManager(QApplication.instance())
         
         # Apply initial window flags based on settings
@@ -288,53 +387,47 @@ class ClipCache(QMainWindow):
         )
         
     def show_context_menu(self, position):
-        items = self.history_list.selectedItems()
-        if not items:
+        indexes = self.history_list.selectionModel().selectedIndexes()
+        if not indexes:
             return
+        item_ids = [index.data(ItemIdRole) for index in indexes]
             
         menu = QMenu()
         
         # Copy action (only enabled for single selection)
         copy_action = menu.addAction("Copy")
-        copy_action.setEnabled(len(items) == 1)
-        copy_action.triggered.connect(lambda: self.copy_to_clipboard(items[0]))
-        
-        # Pin/Unpin action (only enabled for single selection)
-        if len(items) == 1:
-            if items[0].is_pinned:
-                pin_action = menu.addAction("Unpin")
-            else:
-                pin_action = menu.addAction("Pin")
-            pin_action.triggered.connect(lambda: self.toggle_pin(items[0]))
+        copy_action.setEnabled(len(indexes) == 1)
+        copy_action.triggered.connect(lambda: self.copy_to_clipboard(indexes[0]))
+        
+        # Pin and Unpin apply to every selected item they would change
+        pinned = [index.data(PinnedRole) for index in indexes]
+        if not all(pinned):
+            pin_action = menu.addAction("Pin")
+            pin_action.triggered.connect(lambda: self.db.set_pinned(item_ids, True))
+        if any(pinned):
+            unpin_action = menu.addAction("Unpin")
+            unpin_action.triggered.connect(lambda: self.db.set_pinned(item_ids, False))
         
         # Delete action (enabled for single or multiple selections)
         delete_action = menu.addAction("Delete")
-        delete_action.triggered.connect(lambda: self.delete_items(items))
+        delete_action.triggered.connect(lambda: self.delete_items(item_ids))
         
         menu.exec_(self.history_list.mapToGlobal(position))
         
-    def toggle_pin(self, item):
-        if not isinstance(item, AnimatedListItem):
-            return
-            
-        self.db.toggle_pin(item.item_id)
-        self.load_history()
+    def toggle_pin(self, item_id):
+        self.db.toggle_pin(item_id)
         
-    def delete_items(self, items):
-        """Delete multiple items from the history."""
-        if not items:
+    def delete_items(self, item_ids):
+        """Delete multiple items from the history in one transaction."""
+        if not item_ids:
             return
             
-        try:
-            for item in items:
-                if isinstance(item, AnimatedListItem):
-                    self.db.delete_item(item.item_id)
-            self.load_history()
-        except Exception as e:
-            print(f"Error deleting items: {e}")
+        self.db.delete_items(item_ids)
             
     def close(self):
         """Close the application completely."""
+        self.image_ingest.shutdown()
+        self.scanner.shutdown()
         self.db.close()
         self.tray_icon.hide()  # Hide the tray icon
         QApplication.quit()  # Quit the entire application
@@ -347,8 +440,7 @@ class ClipCache(QMainWindow):
         self.show_action.setText("✓ History Window Visible")
         
         # Check if force to front is enabled
-        settings = QSettings("ClipCache", "Settings")
-        if settings.value("force_to_front", False, type=bool):
+        if self.settings.value("force_to_front"):
             self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
             self.activateWindow()
             self.raise_()
@@ -369,56 +461,38 @@ class ClipCache(QMainWindow):
 
     def update_window_flags(self):
         """Update window flags based on settings."""
-        settings = QSettings("ClipCache", "Settings")
-        if settings.value("force_to_front", False, type=bool):
+        visible = self.isVisible()
+        if self.settings.value("force_to_front"):
             self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
         else:
             self.setWindowFlags(self.windowFlags() & ~Qt.WindowStaysOnTopHint)
-        self.show()  # Need to show the window again after changing flags
-
-    def setup_auto_clear_timer(self):
-        """Setup timer to check for expired items."""
-        self.auto_clear_timer = QTimer(self)
-        self.auto_clear_timer.timeout.connect(self.check_expired_items)
-        self.auto_clear_timer.start(60000)  # Check every minute
-        
-    def check_expired_items(self):
-        """Check for and remove expired items."""
-        # Get current settings
-        settings = QSettings("ClipCache", "Settings")
-        auto_clear = settings.value("auto_clear", False, type=bool)
-        
-        if auto_clear:
-            # This will trigger the expiration check in get_history
-            self.load_history()
-            
-            # Update the timer interval to check more frequently
-            self.auto_clear_timer.setInterval(1000)  # Check every second
-        else:
-            self.auto_clear_timer.stop()
-
-    def update_auto_clear_timer(self):
-        """Update the auto-clear timer based on settings."""
-        settings = QSettings("ClipCache", "Settings")
-        auto_clear = settings.value("auto_clear", False, type=bool)
-        auto_clear_time = settings.value("auto_clear_time", 5, type=int)
-        
-        if auto_clear:
-            # Set timer interval to half of the auto-clear time to ensure timely cleanup
-            interval = max(1000, auto_clear_time * 30000)  # Minimum 1 second, maximum 30 minutes
-            self.auto_clear_timer.setInterval(interval)
-            self.auto_clear_timer.start()
-        else:
-            self.auto_clear_timer.stop()
+        # Changing flags hides the window, so a visible one is shown again;
+        # one that hasn't been shown yet picks them up when it is
+        if visible:
+            self.show()
 
     def show_license_info(self):
         """Show the license information dialog."""
+        from license_dialog import LicenseDialog
         dialog = LicenseDialog(self)
         dialog.exec_()
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    app.setWindowIcon(create_clipboard_icon())
-    window = ClipCache()
+def main():
+    parser = argparse.ArgumentParser(description="Clipboard history manager")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print how long each phase of startup takes")
+    # Anything else is left for Qt
+    args, qt_args = parser.parse_known_args()
+    startup = StartupProfile(STARTED, verbose=args.startup_profile)
+    startup.mark("imports")
+    
+    app = QApplication(sys.argv[:1] + qt_args)
+    startup.mark("application")
+    window = ClipCache(startup)
+    app.setWindowIcon(window.icon)
     window.show()
-    sys.exit(app.exec_()) 
\ No newline at end of file
+    startup.mark("show")
+    sys.exit(app.exec_())
+
+if __name__ == "__main__":
+    main() 
\ No newline at end of file
@@ -0,0 +1,61 @@
+import zlib
+
+# zstd and lz4 are optional; zlib from the standard library always works
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Payloads smaller than this are stored raw; the header overhead isn't worth it
+COMPRESSION_THRESHOLD = 1024
+
+# Compressed data is kept only if it is at most this fraction of the original,
+# so payloads that barely compress don't pay for decompression on every read
+MAX_RATIO = 0.9
+
+# Payloads in these formats are deflate-compressed already, so compressing
+# them again would cost a pass over the data for no saving
+PRECOMPRESSED_SIGNATURES = (b"\x89PNG\r\n\x1a\n",)
+
+RAW = "raw"
+
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+if zstandard is not None:
+    CODECS["zstd"] = (lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+                      lambda data: zstandard.ZstdDecompressor().decompress(data))
+if lz4 is not None:
+    CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+
+# zstd compresses about as well as zlib at several times the speed
+DEFAULT_CODEC = "zstd" if "zstd" in CODECS else "zlib"
+
+def compress(content, codec=None):
+    """Return (codec, data) for storing content.
+
+    The codec is RAW when the content is below the threshold or doesn't
+    compress well enough to be worth decompressing on every read.
+    """
+    codec = codec or DEFAULT_CODEC
+    if codec == RAW or len(content) < COMPRESSION_THRESHOLD or content.startswith(PRECOMPRESSED_SIGNATURES):
+        return RAW, content
+    data = CODECS[codec][0](content)
+    if len(data) > len(content) * MAX_RATIO:
+        return RAW, content
+    return codec, data
+
+def decompress(codec, data):
+    """Return the original content of data stored with codec.
+
+    A NULL codec marks a payload stored before compression existed.
+    """
+    if codec is None or codec == RAW:
+        return data
+    if codec not in CODECS:
+        raise ValueError(f"Content was stored with unavailable codec {codec!r}")
+    return CODECS[codec][1](data)
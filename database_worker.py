@@ -0,0 +1,192 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from PyQt5.QtCore import QObject, pyqtSignal
+from metrics import get_metrics
+from secure_database import HISTORY_PAGE_SIZE, SecureDatabase
+
+class AsyncDatabase(QObject):
+    """Runs SecureDatabase calls on a single dedicated worker thread.
+
+    Every call returns a concurrent.futures.Future immediately and is queued
+    for the worker, which owns the only SQLite connection and runs requests
+    one at a time in submission order. An optional callback receives the
+    result on the thread that owns this object (the GUI thread), so slots
+    can post work and react to results without blocking the event loop.
+
+    The row-delta signals of SecureDatabase are re-emitted here; receivers
+    on the GUI thread get them through queued connections. The time each
+    call spends on the worker is recorded as the db.<method> metric.
+    """
+    item_added = pyqtSignal(object)
+    item_updated = pyqtSignal(object)
+    items_removed = pyqtSignal(object)
+
+    # Carries (callback, future) from the worker back to this object's thread
+    _completed = pyqtSignal(object, object)
+
+    def __init__(self, db_path=None, parent=None):
+        super().__init__(parent)
+        self._completed.connect(self._deliver)
+        self.metrics = get_metrics()
+        self._requests = queue.Queue()
+        self._ready = threading.Event()
+        self._init_error = None
+        self._thread = threading.Thread(target=self._run, args=(db_path,), name="clipcache-db", daemon=True)
+        self._thread.start()
+        # Opening an up-to-date database is fast, but after an upgrade this
+        # waits for the migrations and search index builds, which print
+        # their progress; failing here is clearer than failing later
+        self._ready.wait()
+        if self._init_error is not None:
+            raise self._init_error
+
+    def _run(self, db_path):
+        """Worker loop: open the database, then serve requests until close()."""
+        try:
+            db = SecureDatabase(db_path)
+        except Exception as e:
+            self._init_error = e
+            self._ready.set()
+            return
+        db.item_added.connect(self.item_added)
+        db.item_updated.connect(self.item_updated)
+        db.items_removed.connect(self.items_removed)
+        self.db_path = db.db_path
+        # Decrypts previews for views; the cipher holds no per-call state
+        self.cipher = db.cipher
+        self._ready.set()
+
+        while True:
+            request = self._requests.get()
+            if request is None:
+                db.close()
+                return
+            method, args, kwargs, future = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            start = time.perf_counter()
+            try:
+                result = getattr(db, method)(*args, **kwargs)
+            except Exception as e:
+                self.metrics.observe(f"db.{method}", time.perf_counter() - start)
+                self.metrics.increment("db.errors")
+                future.set_exception(e)
+            else:
+                self.metrics.observe(f"db.{method}", time.perf_counter() - start)
+                future.set_result(result)
+
+            # Trim the history and index captured text once the queue is
+            # drained, so a burst of captures doesn't wait behind either.
+            # Trimming first keeps evicted items from being indexed.
+            if self._requests.empty():
+                try:
+                    while db.trim_history() and self._requests.empty():
+                        pass
+                    if db.fts_enabled:
+                        db.index_pending()
+                except Exception as e:
+                    print(f"Database error: {e}")
+
+    def call(self, method, *args, callback=None, **kwargs):
+        """Queue SecureDatabase.<method>(*args, **kwargs) and return its Future."""
+        future = Future()
+        future.add_done_callback(lambda done: self._completed.emit(callback, done))
+        self._requests.put((method, args, kwargs, future))
+        return future
+
+    def _deliver(self, callback, future):
+        """Hand a finished request to its callback, or report its error."""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"Database error: {error}")
+        elif callback is not None:
+            callback(future.result())
+
+    def save_item(self, content_type, content, thumbnail=None, formats=None, offered_formats=None,
+                  captured_at=None, callback=None):
+        return self.call("save_item", content_type, content, thumbnail, formats, offered_formats, captured_at,
+                         callback=callback)
+
+    def get_item(self, item_id, callback=None):
+        return self.call("get_item", item_id, callback=callback)
+
+    def get_formats(self, item_id, callback=None):
+        return self.call("get_formats", item_id, callback=callback)
+
+    def get_history(self, limit=500, callback=None):
+        return self.call("get_history", limit, callback=callback)
+
+    def get_history_page(self, before=None, page_size=HISTORY_PAGE_SIZE, callback=None):
+        return self.call("get_history_page", before, page_size, callback=callback)
+
+    def get_thumbnails(self, item_ids, callback=None):
+        return self.call("get_thumbnails", list(item_ids), callback=callback)
+
+    def search(self, query, limit=50, callback=None):
+        return self.call("search", query, limit, callback=callback)
+
+    def fuzzy_search(self, query, limit=50, callback=None):
+        return self.call("fuzzy_search", query, limit, callback=callback)
+
+    def delete_item(self, item_id, callback=None):
+        return self.call("delete_item", item_id, callback=callback)
+
+    def delete_items(self, item_ids, callback=None):
+        return self.call("delete_items", list(item_ids), callback=callback)
+
+    def toggle_pin(self, item_id, callback=None):
+        return self.call("toggle_pin", item_id, callback=callback)
+
+    def set_pinned(self, item_ids, pinned, callback=None):
+        return self.call("set_pinned", list(item_ids), pinned, callback=callback)
+
+    def clear_history(self, include_pinned=False, content_type=None, since=None, until=None, callback=None):
+        return self.call("clear_history", include_pinned, content_type, since, until, callback=callback)
+
+    def export_history(self, path, gzip=True, callback=None):
+        return self.call("export_history", path, gzip, callback=callback)
+
+    def import_history(self, path, callback=None):
+        return self.call("import_history", path, callback=callback)
+
+    def enforce_history_limit(self, max_items, callback=None):
+        return self.call("enforce_history_limit", max_items, callback=callback)
+
+    def trim_history(self, callback=None):
+        return self.call("trim_history", callback=callback)
+
+    def purge_expired(self, callback=None):
+        return self.call("purge_expired", callback=callback)
+
+    def unscanned_items(self, version, limit=50, callback=None):
+        return self.call("unscanned_items", version, limit, callback=callback)
+
+    def set_scan_results(self, results, version, callback=None):
+        return self.call("set_scan_results", list(results), version, callback=callback)
+
+    def recompress_blobs(self, batch_size=50, callback=None):
+        return self.call("recompress_blobs", batch_size, callback=callback)
+
+    def encrypt_blobs(self, batch_size=50, callback=None):
+        return self.call("encrypt_blobs", batch_size, callback=callback)
+
+    def next_expiration(self, callback=None):
+        return self.call("next_expiration", callback=callback)
+
+    def count_items(self, callback=None):
+        return self.call("count_items", callback=callback)
+
+    def file_size(self):
+        """Return the bytes used by the database file and its write-ahead log."""
+        return sum(os.path.getsize(path) for path in (self.db_path, self.db_path + "-wal")
+                   if os.path.exists(path))
+
+    def close(self, timeout=5):
+        """Finish queued requests, close the connection and stop the worker."""
+        self._requests.put(None)
+        self._thread.join(timeout)
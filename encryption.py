@@ -0,0 +1,193 @@
+import hashlib
+import os
+import re
+import stat
+import unicodedata
+
+# cryptography provides AES-GCM; without it history is stored unencrypted
+try:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+except ImportError:
+    AESGCM = None
+# DPAPI ties the key file to the Windows user account where it is available
+try:
+    import win32crypt
+except ImportError:
+    win32crypt = None
+
+KEY_SIZE = 32
+NONCE_SIZE = 12
+
+# Key files protected with DPAPI start with this marker
+DPAPI_HEADER = b"dpapi:"
+
+# Words are indexed by each of their prefixes from MIN_PREFIX_LENGTH to
+# MAX_PREFIX_LENGTH characters, since blinded tokens can't be prefix-matched.
+# Query terms longer than MAX_PREFIX_LENGTH match on their first
+# MAX_PREFIX_LENGTH characters.
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 16
+
+# Fuzzy search tokens are this many bytes of keyed hash; there are few
+# enough distinct trigrams that collisions don't matter
+TRIGRAM_TOKEN_SIZE = 4
+
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+_WORD = re.compile(r"\w+")
+
+def fold(text):
+    """Lowercase text and strip diacritics, the way search compares words."""
+    return _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text.lower()))
+
+def search_words(text):
+    """Return the folded words of text."""
+    return _WORD.findall(fold(text))
+
+def word_prefixes(text):
+    """Return the set of indexed prefixes of the words in text."""
+    prefixes = set()
+    for word in set(search_words(text)):
+        prefixes.update(word[:length] for length in range(min(MIN_PREFIX_LENGTH, len(word)),
+                                                          min(len(word), MAX_PREFIX_LENGTH) + 1))
+    return prefixes
+
+def word_trigrams(text):
+    """Return the set of trigrams of the words in text, as fuzzy search compares them.
+
+    Each folded word is padded with a space on either side, so " do" and
+    "er " mark where "docker" starts and ends; a typo only changes the
+    trigrams around it.
+    """
+    trigrams = set()
+    for word in set(search_words(text)):
+        word = f" {word} "
+        trigrams.update(word[start:start + 3] for start in range(len(word) - 2))
+    return trigrams
+
+def load_master_key(path):
+    """Return the master key stored at path, creating it on first use."""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data.startswith(DPAPI_HEADER):
+            data = win32crypt.CryptUnprotectData(data[len(DPAPI_HEADER):], None, None, None, 0)[1]
+        return data
+
+    key = os.urandom(KEY_SIZE)
+    data = key
+    if win32crypt is not None:
+        data = DPAPI_HEADER + win32crypt.CryptProtectData(key, "ClipCache", None, None, None, 0)
+    # Created readable by the owner only, never with looser permissions in between
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, stat.S_IRUSR | stat.S_IWUSR)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return key
+
+def open_cipher(key_path):
+    """Return the cipher for a database whose key file is key_path."""
+    if AESGCM is None:
+        print("cryptography is not installed, storing history unencrypted")
+        return PlaintextCipher()
+    return ContentCipher(load_master_key(key_path))
+
+class ContentCipher:
+    """AES-GCM encryption of stored payloads, previews and thumbnails.
+
+    Keys are derived from the master key once, when the database is opened,
+    and kept for the session, so each payload costs a single AES-GCM call.
+    Digests are keyed, so stored digests can't confirm guessed content, and
+    the search indexes hold keyed hashes ("blind" tokens) of word prefixes
+    and word trigrams instead of text. Ciphertext is the random nonce
+    followed by the AES-GCM output; the associated data binds it to where
+    it is stored.
+    """
+    encrypts = True
+
+    def __init__(self, master_key):
+        content_key, digest_key, index_key, trigram_key = (
+            HKDF(algorithm=hashes.SHA256(), length=KEY_SIZE, salt=None,
+                 info=b"clipcache " + label).derive(master_key)
+            for label in (b"content", b"digest", b"search index", b"trigram index"))
+        self._aead = AESGCM(content_key)
+        # Copying a keyed hash is cheaper than keying a new one
+        self._digest = hashlib.blake2b(digest_size=32, key=digest_key)
+        self._blind = hashlib.blake2b(digest_size=8, key=index_key)
+        self._trigram = hashlib.blake2b(digest_size=TRIGRAM_TOKEN_SIZE, key=trigram_key)
+
+    def hasher(self):
+        """Return a new hash object for the digests that identify payloads."""
+        return self._digest.copy()
+
+    def encrypt(self, data, associated_data):
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._aead.encrypt(nonce, bytes(data), associated_data)
+
+    def decrypt(self, data, associated_data):
+        return self._aead.decrypt(data[:NONCE_SIZE], data[NONCE_SIZE:], associated_data)
+
+    def seal_preview(self, preview):
+        """Return the stored form of a preview."""
+        if preview is None:
+            return None
+        return self.encrypt(preview.encode(), b"preview")
+
+    def open_preview(self, value):
+        """Return a stored preview as text; previews stored as text are returned as they are."""
+        if value is None or isinstance(value, str):
+            return value
+        return self.decrypt(value, b"preview").decode()
+
+    def blind(self, term):
+        """Return the search index token for a folded word prefix."""
+        token = self._blind.copy()
+        token.update(term.encode())
+        return token.hexdigest()
+
+    def search_body(self, text):
+        """Return what the search index stores for text."""
+        return " ".join(map(self.blind, word_prefixes(text)))
+
+    def search_match(self, terms):
+        """Return the FTS5 query matching rows that contain every term as a word prefix."""
+        return " ".join(f'"{self.blind(word[:MAX_PREFIX_LENGTH])}"' for word in search_words(" ".join(terms)))
+
+    def trigram_tokens(self, text):
+        """Return the fuzzy search index tokens of the word trigrams of text."""
+        tokens = []
+        for trigram in word_trigrams(text):
+            token = self._trigram.copy()
+            token.update(trigram.encode())
+            tokens.append(token.hexdigest())
+        return tokens
+
+class PlaintextCipher:
+    """Stores everything as it is; used when cryptography is not installed."""
+    encrypts = False
+
+    def hasher(self):
+        return hashlib.blake2b(digest_size=32)
+
+    def encrypt(self, data, associated_data):
+        return data
+
+    def decrypt(self, data, associated_data):
+        raise ValueError("Content is encrypted, but the cryptography package is not installed")
+
+    def seal_preview(self, preview):
+        return preview
+
+    def open_preview(self, value):
+        return "[Encrypted]" if isinstance(value, bytes) else value
+
+    def search_body(self, text):
+        return text
+
+    def search_match(self, terms):
+        # Quoting each term keeps FTS5 operators in user input from being interpreted
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def trigram_tokens(self, text):
+        # Trigrams hold spaces, which the index tokenizer would split them on
+        return [trigram.encode().hex() for trigram in word_trigrams(text)]
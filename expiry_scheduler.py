@@ -0,0 +1,69 @@
+from datetime import datetime
+from PyQt5.QtCore import QObject, QTimer, Qt
+from secure_database import utc_now
+
+# QTimer intervals are signed 32-bit milliseconds; later deadlines re-arm on the way
+MAX_TIMER_INTERVAL = 24 * 60 * 60 * 1000
+
+# Fire slightly after the deadline so the purge never runs just before it
+DEADLINE_SLACK_MS = 10
+
+class ExpiryScheduler(QObject):
+    """Purges auto-cleared items exactly when they expire.
+
+    A single-shot timer is armed for the earliest pending expiration time.
+    When it fires, only the rows that are due are deleted (their removal
+    reaches the views as an items_removed delta) and the timer is re-armed
+    for the next deadline. Rows that arrive with an earlier deadline re-arm
+    it directly, so nothing runs between deadlines and nothing polls.
+    """
+    def __init__(self, db, settings, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.settings = settings
+        self.deadline = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.expire_due_items)
+
+        self.db.item_added.connect(self.on_row_changed)
+        self.db.item_updated.connect(self.on_row_changed)
+        self.settings.changed.connect(self.on_setting_changed)
+
+    def start(self):
+        """Arm the timer for the earliest deadline in the database."""
+        if not self.settings.value("auto_clear"):
+            self.stop()
+            return
+        self.db.next_expiration(callback=self._arm)
+
+    def stop(self):
+        self.timer.stop()
+        self.deadline = None
+
+    def on_setting_changed(self, key, value):
+        if key == "auto_clear":
+            self.start()
+
+    def on_row_changed(self, row):
+        """Re-arm early for a row that expires before the current deadline."""
+        expiration_time = row[6]
+        if expiration_time is None or not self.settings.value("auto_clear"):
+            return
+        deadline = datetime.fromisoformat(expiration_time)
+        if self.deadline is None or deadline < self.deadline:
+            self._arm(deadline)
+
+    def expire_due_items(self):
+        """Delete the items that are due, then wait for the next deadline."""
+        self.deadline = None
+        self.db.purge_expired(callback=lambda _: self.start())
+
+    def _arm(self, deadline):
+        if deadline is None:
+            self.stop()
+            return
+        self.deadline = deadline
+        remaining = int((deadline - utc_now()).total_seconds() * 1000) + DEADLINE_SLACK_MS
+        self.timer.start(min(max(remaining, 0), MAX_TIMER_INTERVAL))
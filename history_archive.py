@@ -0,0 +1,76 @@
+# Framing of the history archives written by SecureDatabase.export_history.
+#
+# An archive starts with ARCHIVE_HEADER, followed by one record per item. A
+# record is a line of JSON metadata, then the bodies the metadata lists, in
+# order. A body is a run of frames, each a 4-byte big-endian length and that
+# many bytes, ended by an empty frame; payloads are written a chunk at a
+# time, so neither side ever holds a whole one. Compressed archives are the
+# same stream, gzipped.
+#
+# Archives hold content decrypted, so they can be imported under another
+# key; they are only as private as the place they are kept.
+
+import gzip
+import json
+import struct
+
+ARCHIVE_HEADER = b"ClipCache history archive 1\n"
+
+FRAME = struct.Struct(">I")
+
+# Metadata lines longer than this aren't from an archive ClipCache wrote
+MAX_METADATA_LENGTH = 1024 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+def open_archive(path, mode, compress=False):
+    """Open an archive for writing ("wb") or reading ("rb").
+
+    Archives being read are decompressed if they are gzipped, whatever
+    compress says.
+    """
+    if mode == "rb":
+        with open(path, "rb") as f:
+            compress = f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    return gzip.open(path, mode, compresslevel=6) if compress else open(path, mode)
+
+def write_header(file):
+    file.write(ARCHIVE_HEADER)
+
+def read_header(file):
+    if file.read(len(ARCHIVE_HEADER)) != ARCHIVE_HEADER:
+        raise ValueError("Not a ClipCache history archive")
+
+def write_metadata(file, metadata):
+    file.write(json.dumps(metadata, separators=(",", ":")).encode() + b"\n")
+
+def read_metadata(file):
+    """Return the metadata of the next record, or None at the end of the archive."""
+    line = file.readline(MAX_METADATA_LENGTH + 1)
+    if not line:
+        return None
+    if not line.endswith(b"\n"):
+        raise ValueError("Archive record is truncated or too long")
+    return json.loads(line)
+
+def write_body(file, chunks):
+    """Write a body from an iterable of byte chunks."""
+    for chunk in chunks:
+        if chunk:
+            file.write(FRAME.pack(len(chunk)))
+            file.write(chunk)
+    file.write(FRAME.pack(0))
+
+def read_body(file):
+    """Yield the frames of the next body; it must be read to the end before the next one."""
+    while True:
+        header = file.read(FRAME.size)
+        if len(header) != FRAME.size:
+            raise ValueError("Archive is truncated")
+        length, = FRAME.unpack(header)
+        if length == 0:
+            return
+        data = file.read(length)
+        if len(data) != length:
+            raise ValueError("Archive is truncated")
+        yield data
@@ -0,0 +1,427 @@
+import html
+from bisect import bisect_left
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QPixmap, QPainter, QTextDocument
+from PyQt5.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionViewItem
+from history_roles import ItemIdRole, ContentTypeRole, PinnedRole, SensitiveRole, SnippetRole
+from secure_database import HISTORY_PAGE_SIZE, SNIPPET_START, SNIPPET_END
+
+STATUS_ICON_SIZE = 16
+
+# QStyle.standardIcon builds a new icon on every call, which adds up over
+# a few hundred rows, so each icon is looked up once
+_standard_icons = {}
+
+def status_icon(content_type, is_pinned, is_sensitive):
+    """Return the icon reflecting the content type and pinned status."""
+    if is_pinned:
+        standard_pixmap = QStyle.SP_DialogSaveButton
+    elif is_sensitive:
+        standard_pixmap = QStyle.SP_MessageBoxWarning
+    elif content_type == "text":
+        standard_pixmap = QStyle.SP_FileIcon
+    else:
+        standard_pixmap = QStyle.SP_FileDialogDetailedView
+    icon = _standard_icons.get(standard_pixmap)
+    if icon is None:
+        icon = _standard_icons[standard_pixmap] = QApplication.style().standardIcon(standard_pixmap)
+    return icon
+
+def _timestamp_key(timestamp):
+    """Turn a 'YYYY-MM-DD HH:MM:SS[.SSS]' timestamp into a sortable integer."""
+    return int("".join(ch for ch in timestamp if ch.isdigit()).ljust(17, "0"))
+
+def _sort_key(is_pinned, timestamp, item_id):
+    """Return the key ordering rows like the database listing: pinned first, then newest first."""
+    return (not is_pinned, -_timestamp_key(timestamp), -item_id)
+
+class HistoryEntry:
+    """Display data for one history row, built once when the row arrives.
+
+    Rows carry the preview stored at capture time, never the content.
+    Stored previews are encrypted and opened with open_preview the first
+    time the entry is displayed, so loading a long history decrypts only
+    the rows in view. Image rows are shown from their stored
+    (png_data, width, height) thumbnail once it arrives; the full image is
+    never decoded here, and the thumbnail only once the row is displayed.
+    """
+    def __init__(self, row, open_preview):
+        item_id, content_type, preview, timestamp, is_pinned, is_sensitive, expiration_time, size = row
+        self.item_id = item_id
+        self.content_type = content_type
+        self.size = size
+        self.thumbnail = None
+        self.image_size = None
+        self._thumbnail_data = None
+        self._decoration = None
+        self._open_preview = open_preview
+        self._preview = preview
+        if preview is None:
+            self._preview = "[Image]" if content_type == "image" else ""
+
+        self.update(timestamp, is_pinned, is_sensitive, expiration_time)
+
+    @property
+    def preview(self):
+        if not isinstance(self._preview, str):
+            self._preview = self._open_preview(self._preview)
+        return self._preview
+
+    @preview.setter
+    def preview(self, preview):
+        self._preview = preview
+
+    @property
+    def decoration(self):
+        if self._decoration is None:
+            self._decoration = self._build_decoration()
+        return self._decoration
+
+    def set_thumbnail(self, thumbnail):
+        """Show a (png_data, width, height) thumbnail for an image entry."""
+        data, width, height = thumbnail
+        self._thumbnail_data = data
+        self.thumbnail = None
+        self.image_size = (width, height)
+        # Images saved before previews were stored get theirs from the thumbnail
+        if self.preview == "[Image]":
+            self.preview = f"Image ({width}x{height})"
+        self._decoration = None
+
+    def pixmap_bytes(self):
+        """Return the memory held by the decoded thumbnail and decoration."""
+        return sum(pixmap.width() * pixmap.height() * pixmap.depth() // 8
+                   for pixmap in (self.thumbnail, self._decoration) if isinstance(pixmap, QPixmap))
+
+    def update(self, timestamp, is_pinned, is_sensitive, expiration_time):
+        """Update the mutable state of the entry and rebuild its decoration."""
+        self.timestamp = timestamp
+        self.is_pinned = bool(is_pinned)
+        self.is_sensitive = bool(is_sensitive)
+        self.expiration_time = expiration_time
+        self.sort_key = _sort_key(self.is_pinned, self.timestamp, self.item_id)
+        # Rebuilt the next time the row is displayed
+        self._decoration = None
+
+    def _build_decoration(self):
+        """Return the status icon, or the thumbnail with the status icon overlaid."""
+        icon = status_icon(self.content_type, self.is_pinned, self.is_sensitive)
+        if self._thumbnail_data is None:
+            return icon
+        if self.thumbnail is None:
+            self.thumbnail = QPixmap()
+            self.thumbnail.loadFromData(self._thumbnail_data)
+
+        # A pixmap decoration keeps its own size, unlike an icon
+        pixmap = QPixmap(self.thumbnail)
+        painter = QPainter(pixmap)
+        painter.drawPixmap(0, 0, icon.pixmap(STATUS_ICON_SIZE, STATUS_ICON_SIZE))
+        painter.end()
+        return pixmap
+
+class HistoryModel(QAbstractListModel):
+    """List model of clipboard history updated by row deltas.
+
+    load() resets the model from the first page of the history. After
+    that, add_row, update_row and remove_ids each touch only the affected
+    rows, so the view never rebuilds items it already has.
+    thumbnail_loader(item_ids, callback) must eventually call callback with
+    {item_id: (png_data, width, height)} for the image rows; until then
+    those rows show a placeholder icon. open_preview(stored_preview)
+    returns the text of a stored preview.
+
+    The view asks for further pages as it is scrolled (canFetchMore and
+    fetchMore); page_loader(before, callback) must call callback with the
+    rows of SecureDatabase.get_history_page(before). The model holds
+    exactly the rows up to the last one listed, so rows that change to
+    sort after it are dropped until their page is fetched, and rows that
+    change to sort before it are inserted.
+    """
+    def __init__(self, thumbnail_loader, open_preview, page_loader=None, parent=None):
+        super().__init__(parent)
+        self._thumbnail_loader = thumbnail_loader
+        self._open_preview = open_preview
+        self._page_loader = page_loader
+        self._entries = []
+        self._keys = []  # sort keys parallel to _entries, for bisection
+        self._by_id = {}
+        # The (is_pinned, timestamp, id) and sort key of the last row
+        # listed, or None once the whole history is loaded
+        self._cursor = None
+        self._end_key = None
+        self._fetching = False
+        # Pages requested before a reload are ignored when they arrive
+        self._generation = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._entries[index.row()]
+        if role == Qt.DisplayRole:
+            return entry.preview
+        elif role == Qt.DecorationRole:
+            return entry.decoration
+        elif role == ItemIdRole:
+            return entry.item_id
+        elif role == ContentTypeRole:
+            return entry.content_type
+        elif role == PinnedRole:
+            return entry.is_pinned
+        elif role == SensitiveRole:
+            return entry.is_sensitive
+        return None
+
+    def entry(self, item_id):
+        """Return the entry for an item id, or None if it isn't loaded."""
+        return self._by_id.get(item_id)
+
+    def pixmap_bytes(self):
+        """Return the memory held by the thumbnails and decorations of loaded image rows."""
+        return sum(entry.pixmap_bytes() for entry in self._entries if entry.image_size is not None)
+
+    def load(self, rows):
+        """Replace the model contents with the first page of the history."""
+        self.beginResetModel()
+        self._entries = [HistoryEntry(row, self._open_preview) for row in rows]
+        self._entries.sort(key=lambda entry: entry.sort_key)
+        self._keys = [entry.sort_key for entry in self._entries]
+        self._by_id = {entry.item_id: entry for entry in self._entries}
+        self._generation += 1
+        self._fetching = False
+        self._set_end(rows)
+        self.endResetModel()
+        self._request_thumbnails([row[0] for row in rows if row[1] == "image"])
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._page_loader is None:
+            return False
+        return self._cursor is not None and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._fetching = True
+        generation = self._generation
+        self._page_loader(self._cursor, lambda rows: self._append_page(rows, generation))
+
+    def _append_page(self, rows, generation):
+        """Add a page that follows the loaded rows."""
+        if generation != self._generation:
+            return
+        self._fetching = False
+        entries = [HistoryEntry(row, self._open_preview) for row in rows if row[0] not in self._by_id]
+        entries.sort(key=lambda entry: entry.sort_key)
+        if entries:
+            position = len(self._entries)
+            self.beginInsertRows(QModelIndex(), position, position + len(entries) - 1)
+            self._entries.extend(entries)
+            self._keys.extend(entry.sort_key for entry in entries)
+            self._by_id.update((entry.item_id, entry) for entry in entries)
+            self.endInsertRows()
+        self._set_end(rows)
+        self._request_thumbnails([entry.item_id for entry in entries if entry.content_type == "image"])
+
+    def _set_end(self, rows):
+        """Remember where a listing stopped; a short page is the last one."""
+        if self._page_loader is None or len(rows) < HISTORY_PAGE_SIZE:
+            self._cursor = self._end_key = None
+            return
+        item_id, _, _, timestamp, is_pinned = rows[-1][:5]
+        self._cursor = (is_pinned, timestamp, item_id)
+        self._end_key = _sort_key(is_pinned, timestamp, item_id)
+
+    def _beyond_end(self, entry):
+        """Return whether an entry sorts after the last row listed."""
+        return self._end_key is not None and entry.sort_key > self._end_key
+
+    def add_row(self, row):
+        """Insert a new history row at its sorted position."""
+        if row[0] in self._by_id:
+            self.update_row(row)
+            return
+        entry = HistoryEntry(row, self._open_preview)
+        if self._beyond_end(entry):
+            return
+        self._insert(entry)
+        if row[1] == "image":
+            self._request_thumbnails([row[0]])
+
+    def _request_thumbnails(self, item_ids):
+        if item_ids:
+            self._thumbnail_loader(item_ids, self._apply_thumbnails)
+
+    def _apply_thumbnails(self, thumbnails):
+        """Attach loaded thumbnails to the entries that are still present."""
+        for item_id, thumbnail in thumbnails.items():
+            entry = self._by_id.get(item_id)
+            if entry is None:
+                continue
+            entry.set_thumbnail(thumbnail)
+            index = self.index(self._position(entry))
+            self.dataChanged.emit(index, index)
+
+    def update_row(self, row):
+        """Apply changes to a row, moving it if its position changed."""
+        entry = self._by_id.get(row[0])
+        if entry is None:
+            # A row from a page not fetched yet, re-copied or pinned from
+            # search results, now sorts among the loaded rows
+            self.add_row(row)
+            return
+
+        position = self._position(entry)
+        entry.update(*row[3:7])
+        if self._beyond_end(entry):
+            # Unpinned past the loaded rows; it returns with a later page
+            self._remove_at(position, position)
+            return
+        if self._keys[position] == entry.sort_key:
+            index = self.index(position)
+            self.dataChanged.emit(index, index)
+            return
+
+        # Pinning moves the row between sections, and a re-copy moves it to the top
+        self._remove_at(position, position)
+        self._insert(entry)
+
+    def remove_ids(self, item_ids):
+        """Remove the rows for the given item ids, ignoring unknown ids."""
+        positions = sorted((self._position(self._by_id[item_id])
+                            for item_id in item_ids if item_id in self._by_id), reverse=True)
+
+        # Remove contiguous runs in one step, from the bottom up so positions stay valid
+        while positions:
+            last = first = positions.pop(0)
+            while positions and positions[0] == first - 1:
+                first = positions.pop(0)
+            self._remove_at(first, last)
+
+    def _position(self, entry):
+        """Return the row of a loaded entry."""
+        return bisect_left(self._keys, entry.sort_key)
+
+    def _insert(self, entry):
+        position = bisect_left(self._keys, entry.sort_key)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._entries.insert(position, entry)
+        self._keys.insert(position, entry.sort_key)
+        self._by_id[entry.item_id] = entry
+        self.endInsertRows()
+
+    def _remove_at(self, first, last):
+        self.beginRemoveRows(QModelIndex(), first, last)
+        for entry in self._entries[first:last + 1]:
+            del self._by_id[entry.item_id]
+        del self._entries[first:last + 1]
+        del self._keys[first:last + 1]
+        self.endRemoveRows()
+
+class SearchResult:
+    """One ranked search hit from SecureDatabase.search."""
+    def __init__(self, row):
+        item_id, content_type, snippet, timestamp, is_pinned, is_sensitive = row
+        self.item_id = item_id
+        self.content_type = content_type
+        self.timestamp = timestamp
+        self.preview = snippet.replace(SNIPPET_START, "").replace(SNIPPET_END, "")
+        # Escape first so clipboard text can't inject markup into the delegate
+        self.snippet = (html.escape(snippet)
+                        .replace(SNIPPET_START, "<b>").replace(SNIPPET_END, "</b>"))
+        self.set_flags(is_pinned, is_sensitive)
+
+    def set_flags(self, is_pinned, is_sensitive):
+        self.is_pinned = bool(is_pinned)
+        self.is_sensitive = bool(is_sensitive)
+        self.decoration = status_icon(self.content_type, self.is_pinned, self.is_sensitive)
+
+class SearchResultsModel(QAbstractListModel):
+    """Search results in rank order.
+
+    Results are a snapshot of one query; pin changes and deletions still
+    arrive as row deltas so the results stay consistent with the history.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._results = []
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._results)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        result = self._results[index.row()]
+        if role == Qt.DisplayRole:
+            return result.preview
+        elif role == SnippetRole:
+            return result.snippet
+        elif role == Qt.DecorationRole:
+            return result.decoration
+        elif role == ItemIdRole:
+            return result.item_id
+        elif role == ContentTypeRole:
+            return result.content_type
+        elif role == PinnedRole:
+            return result.is_pinned
+        elif role == SensitiveRole:
+            return result.is_sensitive
+        return None
+
+    def load(self, rows):
+        """Replace the results with the rows of a new search."""
+        self.beginResetModel()
+        self._results = [SearchResult(row) for row in rows]
+        self.endResetModel()
+
+    def update_row(self, row):
+        """Apply changed flags from a history row to a matching result."""
+        for position, result in enumerate(self._results):
+            if result.item_id == row[0]:
+                result.set_flags(row[4], row[5])
+                index = self.index(position)
+                self.dataChanged.emit(index, index)
+                return
+
+    def remove_ids(self, item_ids):
+        """Drop results for deleted items."""
+        item_ids = set(item_ids)
+        for position in reversed(range(len(self._results))):
+            if self._results[position].item_id in item_ids:
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self._results[position]
+                self.endRemoveRows()
+
+class SnippetDelegate(QStyledItemDelegate):
+    """Paints SnippetRole rich text in place of the plain display text."""
+    def paint(self, painter, option, index):
+        snippet = index.data(SnippetRole)
+        if snippet is None:
+            super().paint(painter, option, index)
+            return
+
+        option = QStyleOptionViewItem(option)
+        self.initStyleOption(option, index)
+        style = option.widget.style() if option.widget else QApplication.style()
+
+        # Let the style draw the background, selection and icon, then the text on top
+        option.text = ""
+        style.drawControl(QStyle.CE_ItemViewItem, option, painter, option.widget)
+        text_rect = style.subElementRect(QStyle.SE_ItemViewItemText, option, option.widget)
+
+        document = QTextDocument()
+        document.setDefaultFont(option.font)
+        document.setHtml(snippet)
+        document.setTextWidth(text_rect.width())
+
+        painter.save()
+        painter.translate(text_rect.topLeft())
+        painter.setClipRect(text_rect.translated(-text_rect.topLeft()))
+        document.drawContents(painter)
+        painter.restore()
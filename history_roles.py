@@ -0,0 +1,10 @@
+from PyQt5.QtCore import Qt
+
+# Custom data roles exposed by HistoryModel and SearchResultsModel. They live
+# apart from history_model so the window can use them without importing the
+# database before the tray icon is shown.
+ItemIdRole = Qt.UserRole
+ContentTypeRole = Qt.UserRole + 1
+PinnedRole = Qt.UserRole + 2
+SensitiveRole = Qt.UserRole + 3
+SnippetRole = Qt.UserRole + 4  # rich text with search matches highlighted
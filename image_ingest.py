@@ -0,0 +1,65 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from secure_database import utc_now
+from thumbnails import encode_png, image_thumbnail
+
+# Qt maps PNG quality 80 to deflate level 1: about twice as fast to encode as
+# the default level for screenshots, and only a few percent larger
+PNG_QUALITY = 80
+
+def pixel_digest(image):
+    """Return a digest of an image's raw pixels, without encoding it."""
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.width()}x{image.height()}:{int(image.format())}:".encode())
+    digest.update(bits)  # hashlib releases the GIL on large buffers
+    return digest.digest()
+
+class ImageIngest:
+    """Encodes captured images on a worker pool and hands them to the database.
+
+    submit() returns at once. A worker hashes the raw pixels first, so the
+    same image copied again is dropped before any encoding is done; otherwise
+    it encodes the PNG and thumbnail and only then queues save_item, so the
+    row is committed once the encode has finished. The row is dated when
+    the image was submitted, so it keeps its place among the captures
+    around it. An image the source already offered encoded is stored as it
+    was offered, without a PNG.
+    """
+    def __init__(self, db, max_workers=2):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clipcache-image")
+        self._lock = threading.Lock()
+        self._last_digest = None
+
+    def submit(self, image, encoded=None, formats=None, offered_formats=None):
+        """Queue a clipboard image for ingest, with what clipboard_formats found besides it."""
+        return self._executor.submit(self._ingest, image, encoded, formats, offered_formats, utc_now())
+
+    def forget_last(self):
+        """Let the last image be captured again, e.g. after other content was copied."""
+        with self._lock:
+            self._last_digest = None
+
+    def _ingest(self, image, encoded, formats, offered_formats, captured_at):
+        digest = pixel_digest(image)
+        with self._lock:
+            if digest == self._last_digest:
+                return
+            self._last_digest = digest
+
+        try:
+            content = encoded or encode_png(image, PNG_QUALITY)
+            thumbnail = image_thumbnail(image)
+        except Exception as e:
+            print(f"Error encoding image: {e}")
+            self.forget_last()
+            return
+        self.db.save_item("image", content, thumbnail=thumbnail, formats=formats, offered_formats=offered_formats,
+                          captured_at=captured_at)
+
+    def shutdown(self):
+        """Finish images already submitted, so their rows are saved before exit."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,202 @@
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Upper bounds of the latency buckets in milliseconds; slower observations
+# land in a final overflow bucket
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    """Latency histogram with fixed buckets.
+
+    Recording is a bisection and a few additions, and memory doesn't grow
+    with the number of observations. Percentiles are reported as the upper
+    bound of the bucket they fall in, or the maximum for the overflow
+    bucket.
+    """
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, fraction):
+        """Return the bucket bound below which fraction of the observations fall."""
+        rank = max(1, round(self.count * fraction))
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+            "buckets": {(f"<={bound}" if i < len(LATENCY_BUCKETS_MS) else f">{LATENCY_BUCKETS_MS[-1]}"): count
+                        for i, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + (None,), self.buckets))
+                        if count},
+        }
+
+class MetricsRegistry:
+    """Process-wide counters, latency histograms and gauges.
+
+    Counters and histograms may be updated from any thread. A gauge holds
+    either a value or a callable returning one; callables are evaluated by
+    snapshot(), which is meant to be called on the GUI thread. Refreshers
+    added with add_refresher are called by refresh() to update gauges whose
+    values have to be fetched asynchronously, such as the database row
+    count. While disabled, recording does nothing.
+    """
+    def __init__(self):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._refreshers = []
+        self._started = time.time()
+
+    def increment(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        """Record a latency, in seconds, in the histogram called name."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    @contextmanager
+    def timer(self, name):
+        """Record how long the with block takes in the histogram called name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def set_gauge(self, name, value):
+        """Set a gauge to a value, or to a callable returning its value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def add_refresher(self, refresher):
+        self._refreshers.append(refresher)
+
+    def refresh(self):
+        """Ask refreshers to update their gauges; new values may arrive later."""
+        for refresher in self._refreshers:
+            refresher()
+
+    def reset(self):
+        """Clear counters and histograms; gauges are kept."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._started = time.time()
+
+    def snapshot(self):
+        """Return all metrics as a JSON-serializable dictionary."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+            gauges = dict(self._gauges)
+            started = self._started
+
+        for name, value in gauges.items():
+            if callable(value):
+                try:
+                    gauges[name] = value()
+                except Exception as e:
+                    print(f"Error reading gauge {name}: {e}")
+                    gauges[name] = None
+        return {
+            "since": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+            "taken": datetime.now(timezone.utc).isoformat(),
+            "enabled": self.enabled,
+            "counters": dict(sorted(counters.items())),
+            "latency": dict(sorted(histograms.items())),
+            "gauges": dict(sorted(gauges.items())),
+        }
+
+    def dump(self, path):
+        """Write a snapshot to path as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+_metrics = None
+
+def get_metrics():
+    """Return the shared MetricsRegistry, creating it on first use."""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
+
+class StartupProfile:
+    """Time spent in each phase of application startup.
+
+    mark(phase) ends a phase that began at the previous mark, or at
+    started for the first one. finish() records every phase as a
+    startup.<phase>_ms gauge and, with verbose set (the --startup-profile
+    option), prints the breakdown.
+    """
+    def __init__(self, started=None, verbose=False):
+        self.started = time.perf_counter() if started is None else started
+        self.verbose = verbose
+        self.phases = []
+        self.finished = False
+        self._last = self.started
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def until(self, phase):
+        """Return the seconds from the start to the end of phase."""
+        elapsed = 0.0
+        for name, seconds in self.phases:
+            elapsed += seconds
+            if name == phase:
+                return elapsed
+        raise KeyError(phase)
+
+    def finish(self):
+        """Record the phases marked so far; later calls do nothing."""
+        if self.finished:
+            return
+        self.finished = True
+        metrics = get_metrics()
+        for phase, seconds in self.phases:
+            metrics.set_gauge(f"startup.{phase.replace(' ', '_')}_ms", round(seconds * 1000, 1))
+        if self.verbose:
+            print(f"{'phase':<14} {'ms':>8} {'total ms':>9}")
+            elapsed = 0.0
+            for phase, seconds in self.phases:
+                elapsed += seconds
+                print(f"{phase:<14} {seconds * 1000:8.1f} {elapsed * 1000:9.1f}")
+            sys.stdout.flush()
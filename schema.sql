@@ -1,21 +1,160 @@
 -- ClipCache Database Schema
+--
+-- SecureDatabase creates new databases by running this file, and creates
+-- the objects it defines when they are missing from older databases after
+-- migrating them. Changing a table, or anything else a migration has to
+-- do, needs a new migration in secure_database.py and a higher
+-- user_version at the end of this file.
 
 -- Main clipboard history table
 CREATE TABLE clipboard_history (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     content_type TEXT NOT NULL,  -- 'text' or 'image'
-    content BLOB,                -- The actual clipboard content
+    content BLOB,                -- Legacy inline content, NULL once moved to content_blobs
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
     is_pinned BOOLEAN DEFAULT 0,
     is_sensitive BOOLEAN DEFAULT 0,
-    expiration_time DATETIME     -- NULL for pinned items, timestamp for auto-clear
+    expiration_time DATETIME,    -- NULL for pinned items, timestamp for auto-clear
+    content_digest BLOB,         -- References content_blobs.digest
+    preview TEXT,                -- First 100 characters of text, or 'Image (WxH)'; AES-GCM encrypted BLOB unless stored before encryption
+    size INTEGER,                -- Content size in bytes
+    scan_version INTEGER,        -- Sensitive-data rules version is_sensitive was computed with; NULL until scanned
+    offered_formats TEXT         -- MIME types the source offered, one per line; NULL for items captured before they were recorded
 );
 
+-- Each distinct payload, stored once and shared by every row that references it
+CREATE TABLE content_blobs (
+    digest BLOB PRIMARY KEY,     -- Keyed BLAKE2b-256 of the content (unkeyed until encrypted)
+    content BLOB NOT NULL,       -- Encoded by codec, then AES-GCM encrypted: 12-byte nonce, ciphertext, tag
+    size INTEGER NOT NULL,       -- Uncompressed size in bytes
+    codec TEXT,                  -- 'raw', 'zlib', 'zstd' or 'lz4'; NULL until checked for compression
+    chunked BOOLEAN DEFAULT 0,   -- 1 if the content is stored in content_chunks and content is empty
+    encrypted BOOLEAN DEFAULT 0  -- 1 if content, chunks and thumbnail are encrypted; 0 for blobs stored by older versions
+);
+
+-- Payloads larger than one chunk (1 MiB), split into numbered chunks that are compressed separately
+CREATE TABLE content_chunks (
+    digest BLOB NOT NULL,        -- References content_blobs.digest
+    seq INTEGER NOT NULL,        -- Position of the chunk, from 0
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL,          -- Encrypted like content_blobs.content
+    PRIMARY KEY (digest, seq)
+);
+
+-- Thumbnail and dimensions of each image blob, generated once at capture
+CREATE TABLE image_thumbnails (
+    digest BLOB PRIMARY KEY,     -- References content_blobs.digest
+    width INTEGER NOT NULL,      -- Full image size
+    height INTEGER NOT NULL,
+    data BLOB NOT NULL           -- PNG scaled to fit 64x64, encrypted along with its blob
+);
+
+-- Formats stored besides an item's primary content, such as HTML, RTF or a
+-- file list, restored along with it when the item is copied back
+CREATE TABLE item_formats (
+    item_id INTEGER NOT NULL,    -- References clipboard_history.id
+    mime_type TEXT NOT NULL,
+    digest BLOB NOT NULL,        -- References content_blobs.digest
+    PRIMARY KEY (item_id, mime_type)
+) WITHOUT ROWID;
+
+-- Item counts, a single row kept up to date by triggers; the history limit
+-- applies to unpinned items only
+CREATE TABLE history_counts (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL,
+    unpinned INTEGER NOT NULL
+);
+
+INSERT INTO history_counts (id, total, unpinned) VALUES (0, 0, 0);
+
 -- Indexes for better performance
-CREATE INDEX idx_timestamp ON clipboard_history(timestamp);
-CREATE INDEX idx_is_pinned ON clipboard_history(is_pinned);
+CREATE INDEX idx_history_order ON clipboard_history(is_pinned, timestamp);  -- Listing and eviction order
 CREATE INDEX idx_expiration ON clipboard_history(expiration_time);
+CREATE INDEX idx_content_digest ON clipboard_history(content_digest);
+CREATE INDEX idx_unchecked_blobs ON content_blobs(digest) WHERE codec IS NULL;
+CREATE INDEX idx_plaintext_blobs ON content_blobs(digest) WHERE NOT encrypted;
+CREATE INDEX idx_item_formats_digest ON item_formats(digest);
+
+-- Drop a blob once the last row referencing it is gone
+CREATE TRIGGER content_blobs_gc AFTER DELETE ON clipboard_history
+WHEN NOT EXISTS (SELECT 1 FROM clipboard_history WHERE content_digest = old.content_digest)
+AND NOT EXISTS (SELECT 1 FROM item_formats WHERE digest = old.content_digest)
+BEGIN
+    DELETE FROM content_blobs WHERE digest = old.content_digest;
+END;
+
+CREATE TRIGGER item_formats_delete AFTER DELETE ON clipboard_history
+BEGIN
+    DELETE FROM item_formats WHERE item_id = old.id;
+END;
+
+CREATE TRIGGER item_formats_gc AFTER DELETE ON item_formats
+WHEN NOT EXISTS (SELECT 1 FROM item_formats WHERE digest = old.digest)
+AND NOT EXISTS (SELECT 1 FROM clipboard_history WHERE content_digest = old.digest)
+BEGIN
+    DELETE FROM content_blobs WHERE digest = old.digest;
+END;
+
+CREATE TRIGGER history_counts_insert AFTER INSERT ON clipboard_history
+BEGIN
+    UPDATE history_counts SET total = total + 1, unpinned = unpinned + (new.is_pinned = 0);
+END;
+
+CREATE TRIGGER history_counts_delete AFTER DELETE ON clipboard_history
+BEGIN
+    UPDATE history_counts SET total = total - 1, unpinned = unpinned - (old.is_pinned = 0);
+END;
+
+CREATE TRIGGER history_counts_pin AFTER UPDATE OF is_pinned ON clipboard_history
+BEGIN
+    UPDATE history_counts SET unpinned = unpinned + (new.is_pinned = 0) - (old.is_pinned = 0);
+END;
+
+CREATE TRIGGER image_thumbnails_gc AFTER DELETE ON content_blobs
+BEGIN
+    DELETE FROM image_thumbnails WHERE digest = old.digest;
+END;
+
+CREATE TRIGGER content_chunks_gc AFTER DELETE ON content_blobs
+WHEN old.chunked
+BEGIN
+    DELETE FROM content_chunks WHERE digest = old.digest;
+END;
+
+-- Full-text index over text items, written by the application since SQL can't
+-- read encrypted content. Each body is the blind tokens (keyed BLAKE2b of every
+-- word prefix, in hex) of the item's text, or the text itself when content is
+-- stored unencrypted. It is left out when SQLite is built without FTS5, and
+-- rebuilt when it is missing.
+CREATE VIRTUAL TABLE history_fts USING fts5(
+    body,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER history_fts_delete AFTER DELETE ON clipboard_history
+BEGIN
+    DELETE FROM history_fts WHERE rowid = old.id;
+END;
+
+-- Trigram index for fuzzy search, kept alongside history_fts. Each body is the
+-- tokens of the distinct trigrams of the item's words (keyed BLAKE2b in hex, or
+-- the trigram's UTF-8 in hex when content is stored unencrypted); detail=none
+-- keeps only which items hold each token, all fuzzy search needs.
+CREATE VIRTUAL TABLE history_trigrams USING fts5(
+    body,
+    tokenize = 'ascii',
+    detail = none
+);
+
+CREATE TRIGGER history_trigrams_delete AFTER DELETE ON clipboard_history
+BEGIN
+    DELETE FROM history_trigrams WHERE rowid = old.id;
+END;
+
+PRAGMA user_version = 2;
 
 -- Example of how the table would be used:
--- INSERT INTO clipboard_history (content_type, content, is_pinned) 
--- VALUES ('text', 'Sample text content', 0); 
\ No newline at end of file
+-- INSERT INTO content_blobs (digest, content, size, codec) VALUES (X'…', 'Sample text content', 19, 'raw');
+-- INSERT INTO clipboard_history (content_type, content_digest, is_pinned) 
+-- VALUES ('text', X'…', 0); 
\ No newline at end of file
@@ -1,20 +1,211 @@
 import os
+import hashlib
+import heapq
 import sqlite3
 import re
 import stat
-from PyQt5.QtCore import QSettings
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from PyQt5.QtCore import QObject, pyqtSignal
+from settings_store import get_settings_store
+from thumbnails import make_thumbnail
+from compression import RAW, compress, decompress
+from sensitive_scanner import is_sensitive
+from encryption import fold, open_cipher, search_words
+from history_archive import (open_archive, read_body, read_header, read_metadata,
+                             write_body, write_header, write_metadata)
 
-class SecureDatabase:
-    def __init__(self):
-        self.db_path = os.path.join(os.path.expanduser("~"), ".clipcache", "history.db")
+
+# Markers wrapped around matched terms in search snippets; sanitize_data
+# strips control characters, so they never occur in stored text
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+
+# Search ranks at most this many of the newest matches
+SEARCH_CANDIDATES = 1000
+
+# The full-text and fuzzy search indexes, which the application writes and
+# creates apart from the rest of schema.sql
+SEARCH_INDEXES = ("history_fts", "history_trigrams")
+
+# Fuzzy search reads at most about this many index entries, shared among the
+# query's trigrams, newest first, and scores the FUZZY_CANDIDATES items that
+# have the most of them. Items sharing less than FUZZY_THRESHOLD of the
+# query's trigrams are not matches.
+FUZZY_POSTINGS = 6000
+FUZZY_CANDIDATES = 100
+FUZZY_THRESHOLD = 0.3
+
+# Fuzzy matches are ranked by similarity, and by recency with this weight;
+# an item's recency halves every RECENCY_HALF_LIFE_DAYS
+RECENCY_WEIGHT = 0.2
+RECENCY_HALF_LIFE_DAYS = 7
+
+# Fuzzy search compares the words in the first this many characters of an item
+FUZZY_TEXT_LENGTH = 4096
+
+# Rows per get_history_page call; enough to fill a maximized window
+HISTORY_PAGE_SIZE = 200
+
+# Columns of a history row, in the order get_history returns them. Listing
+# reads only clipboard_history; content is resolved from the blob store
+# through CONTENT_FROM only when it is actually needed.
+HISTORY_COLUMNS = "id, content_type, preview, timestamp, is_pinned, is_sensitive, expiration_time, size"
+CONTENT_FROM = "clipboard_history h JOIN content_blobs b ON b.digest = h.content_digest"
+
+# schema.sql is the schema of new databases; existing ones are migrated to it
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+SCHEMA_OBJECT = re.compile(r"^CREATE\s+(?:VIRTUAL\s+)?(TABLE|INDEX|TRIGGER)\s+(\w+)", re.MULTILINE | re.IGNORECASE)
+
+# SecureDatabase methods migrating a database from each schema version to
+# the next, in order; the last one leads to the user_version of schema.sql
+MIGRATIONS = [
+    "_migrate_legacy_schema",
+    "_migrate_to_item_formats",
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Rows migrated per batch; progress is reported after each batch
+MIGRATION_BATCH_SIZE = 5000
+
+def schema_statements():
+    """Return the statements of schema.sql, each with the comments before it."""
+    statements = []
+    statement = ""
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        for line in f:
+            statement += line
+            if sqlite3.complete_statement(statement):
+                statements.append(statement.strip())
+                statement = ""
+    return statements
+
+def report_progress(done, total=None):
+    """Print the progress of a long migration."""
+    print(f"  {done} of {total} items" if total else f"  {done} items")
+
+# Unpinned items may exceed the history limit by this fraction before any
+# are evicted; trimming then goes back down to the limit, so eviction runs
+# once per batch of captures instead of on every capture
+TRIM_SLACK = 0.05
+
+# Most items trim_history deletes in one transaction
+TRIM_BATCH_SIZE = 500
+
+# clear_history builds the search indexes again for the text items it keeps,
+# instead of deleting from them, when it removes this many times as many;
+# deleting an item's entries costs about a twentieth of indexing it
+SEARCH_REBUILD_RATIO = 20
+
+# import_history commits after this many items, or once the text it has yet
+# to index reaches IMPORT_BATCH_TEXT bytes
+IMPORT_BATCH_SIZE = 500
+IMPORT_BATCH_TEXT = 16 * 1024 * 1024
+
+# Length of the text previews stored with each row, in characters
+PREVIEW_LENGTH = 100
+
+def text_preview(text):
+    """Return the preview shown in the history list for a text item."""
+    return text[:PREVIEW_LENGTH] + "..." if len(text) > PREVIEW_LENGTH else text
+
+# Payloads are sanitized, encoded, hashed and written this many characters
+# (text) or bytes (images) at a time. Larger payloads are stored as several
+# content_chunks rows, so no stage of a capture copies more than a chunk.
+CHUNK_SIZE = 1 << 20
+
+# Characters removed by sanitize_data: control characters other than newline
+CONTROL_CHARACTERS = dict.fromkeys(code for code in range(32) if code != ord("\n"))
+
+def content_digest(content):
+    """Return the unkeyed digest that identified payloads before encryption."""
+    return hashlib.blake2b(content, digest_size=32).digest()
+
+def chunk_associated_data(digest, seq):
+    """Return the associated data that binds an encrypted chunk to its place in a payload."""
+    return digest + seq.to_bytes(4, "big")
+
+def is_search_index_statement(statement):
+    """Return whether a schema.sql statement creates one of SEARCH_INDEXES or its triggers."""
+    return any(name in statement for name in SEARCH_INDEXES)
+
+def highlight_terms(text, terms):
+    """Wrap the words of text that start with one of terms in SNIPPET_START and SNIPPET_END."""
+    prefixes = tuple(search_words(" ".join(terms)))
+    return re.sub(r"\w+", lambda match: (f"{SNIPPET_START}{match.group()}{SNIPPET_END}"
+                                         if fold(match.group()).startswith(prefixes) else match.group()), text)
+
+def payload_chunks(content, limit=None):
+    """Yield a payload as it is stored, one chunk at a time.
+    
+    Text is sanitized and UTF-8 encoded chunk by chunk, and cut on a
+    character boundary once limit bytes have been produced.
+    """
+    if not isinstance(content, str):
+        for start in range(0, len(content), CHUNK_SIZE):
+            yield content[start:start + CHUNK_SIZE]
+        return
+    produced = 0
+    for start in range(0, len(content), CHUNK_SIZE):
+        data = content[start:start + CHUNK_SIZE].translate(CONTROL_CHARACTERS).encode()
+        if limit is not None and produced + len(data) > limit:
+            yield data[:limit - produced].decode(errors="ignore").encode()
+            return
+        produced += len(data)
+        yield data
+
+def measure_payload(content, digest, limit=None):
+    """Return the (digest, size) of the payload payload_chunks would store.
+    
+    digest is a new hash object, such as ContentCipher.hasher returns.
+    """
+    size = 0
+    for chunk in payload_chunks(content, limit):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.digest(), size
+
+def utc_now():
+    """Return the current UTC time as a naive datetime."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def format_timestamp(value):
+    """Format a datetime as UTC text SQLite understands, to the millisecond.
+    
+    Millisecond precision keeps the order of captures made within the same
+    second; the text still sorts correctly against older second-precision
+    timestamps.
+    """
+    return value.isoformat(sep=" ", timespec="milliseconds")
+
+class SecureDatabase(QObject):
+    # Row deltas for views; rows have the same shape as get_history items
+    item_added = pyqtSignal(object)
+    item_updated = pyqtSignal(object)
+    items_removed = pyqtSignal(object)  # list of ids
+    
+    def __init__(self, db_path=None, cipher=None):
+        super().__init__()
+        self.db_path = db_path or os.path.join(os.path.expanduser("~"), ".clipcache", "history.db")
+        self.key_path = os.path.splitext(self.db_path)[0] + ".key"
+        self.settings = get_settings_store()
         
         # Create directory with secure permissions
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        
+        # Keys are derived once here and kept for the session
+        self.cipher = cipher or open_cipher(self.key_path)
         self._secure_file_permissions()
         
+        # Set by trim_history while it evicts a batch at a time
+        self._trimming = False
+        
         # Initialize database
         self.conn = sqlite3.connect(self.db_path)
         self.cursor = self.conn.cursor()
+        self._configure_connection()
         self._init_database()
         
     def _secure_file_permissions(self):
@@ -25,241 +216,1317 @@ class SecureDatabase:
         os.chmod(clipcache_dir, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
         
         # Secure existing files
-        if os.path.exists(self.db_path):
-            os.chmod(self.db_path, stat.S_IRUSR | stat.S_IWUSR)
+        for path in (self.db_path, self.key_path):
+            if os.path.exists(path):
+                os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+                
+    def _configure_connection(self):
+        """Tune the connection for many small writes."""
+        # WAL lets a capture commit with a single fsync of the log instead of
+        # rewriting the rollback journal, and readers never block the writer
+        self.cursor.execute('PRAGMA journal_mode=WAL')
+        # NORMAL is durable across application crashes in WAL mode; only the
+        # last transaction can be lost on power failure
+        self.cursor.execute('PRAGMA synchronous=NORMAL')
+        # Negative values are in KiB, so this is an 8 MB page cache
+        self.cursor.execute('PRAGMA cache_size=-8000')
+        self.cursor.execute('PRAGMA temp_store=MEMORY')
+        # Zero deleted content, so plaintext replaced by encrypt_blobs doesn't
+        # linger in free pages
+        self.cursor.execute('PRAGMA secure_delete=ON')
                 
     def _init_database(self):
-        """Initialize the database with tables."""
-        # Create the main table if it doesn't exist
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clipboard_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content_type TEXT NOT NULL,
-                content BLOB,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                expiration_time DATETIME,
-                is_pinned BOOLEAN DEFAULT 0,
-                is_sensitive BOOLEAN DEFAULT 0
-            )
-        ''')
+        """Create the schema, or migrate an existing database to it.
+        
+        Opening a database whose user_version is already SCHEMA_VERSION
+        runs no DDL and probes nothing.
+        """
+        self.cursor.execute('PRAGMA user_version')
+        version = self.cursor.fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{self.db_path} has schema version {version}, but this version of "
+                               f"ClipCache only knows up to {SCHEMA_VERSION}")
+        
+        if version < SCHEMA_VERSION:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'clipboard_history'")
+            if self.cursor.fetchone() is None:
+                self._create_schema()
+            else:
+                self._migrate(version)
+        
+        self._init_search_index(upgraded=version < SCHEMA_VERSION)
+        self.conn.commit()
+        
+    def _create_schema(self):
+        """Create a new database from schema.sql in one transaction."""
+        self.cursor.execute('BEGIN')
+        for statement in schema_statements():
+            # The search indexes are created by _init_search_index, which
+            # copes with SQLite built without FTS5
+            if not is_search_index_statement(statement):
+                self.cursor.execute(statement)
+        self.cursor.execute('PRAGMA user_version')
+        version = self.cursor.fetchone()[0]
+        if version != SCHEMA_VERSION:
+            raise RuntimeError(f"schema.sql is at version {version}, but MIGRATIONS lead to {SCHEMA_VERSION}")
+        self.conn.commit()
+        
+    def _migrate(self, version):
+        """Run the migrations from version up to SCHEMA_VERSION.
+        
+        Each migration runs in one transaction with its user_version
+        update, so an interrupted migration starts over the next time. The
+        last one also creates whatever schema.sql defines that the
+        database lacks.
+        """
+        for target, migration in enumerate(MIGRATIONS[version:], version + 1):
+            self.cursor.execute('BEGIN')
+            getattr(self, migration)()
+            if target == SCHEMA_VERSION:
+                self._create_missing_objects()
+            self.cursor.execute(f'PRAGMA user_version = {target}')
+            self.conn.commit()
+        
+    def _create_missing_objects(self, kinds=("table", "index", "trigger")):
+        """Create the tables, indexes and triggers of schema.sql the database doesn't have."""
+        self.cursor.execute('SELECT name FROM sqlite_master')
+        existing = {row[0] for row in self.cursor.fetchall()}
+        for statement in schema_statements():
+            match = SCHEMA_OBJECT.search(statement)
+            if (match and match.group(1).lower() in kinds and match.group(2) not in existing
+                    and not is_search_index_statement(statement)):
+                self.cursor.execute(statement)
+        
+    def _migrate_legacy_schema(self):
+        """Migrate a database from before schema versions (version 0 to 1).
+        
+        Those databases went through any number of the changes below, so
+        each one is probed for.
+        """
+        self._create_missing_objects(("table",))
         
         # Check if is_sensitive column exists, add it if it doesn't
         try:
             self.cursor.execute('SELECT is_sensitive FROM clipboard_history LIMIT 1')
         except sqlite3.OperationalError:
-            print("Migrating database to add is_sensitive column...")
-            # Create a temporary table with the new schema
-            self.cursor.execute('''
-                CREATE TABLE clipboard_history_new (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    content_type TEXT NOT NULL,
-                    content BLOB,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    expiration_time DATETIME,
-                    is_pinned BOOLEAN DEFAULT 0,
-                    is_sensitive BOOLEAN DEFAULT 0
-                )
-            ''')
-            
-            # Copy data from old table to new table
-            self.cursor.execute('''
-                INSERT INTO clipboard_history_new (id, content_type, content, timestamp, is_pinned)
-                SELECT id, content_type, content, timestamp, is_pinned
-                FROM clipboard_history
-            ''')
-            
-            # Drop old table and rename new table
-            self.cursor.execute('DROP TABLE clipboard_history')
-            self.cursor.execute('ALTER TABLE clipboard_history_new RENAME TO clipboard_history')
-            
+            print("Adding is_sensitive column...")
+            self.cursor.execute('ALTER TABLE clipboard_history ADD COLUMN is_sensitive BOOLEAN DEFAULT 0')
+        
         # Check if expiration_time column exists, add it if it doesn't
         try:
             self.cursor.execute('SELECT expiration_time FROM clipboard_history LIMIT 1')
         except sqlite3.OperationalError:
             print("Adding expiration_time column...")
             self.cursor.execute('ALTER TABLE clipboard_history ADD COLUMN expiration_time DATETIME')
-            
-        self.conn.commit()
+        
+        # Check if content_digest column exists, move content to the blob store if it doesn't
+        try:
+            self.cursor.execute('SELECT content_digest FROM clipboard_history LIMIT 1')
+        except sqlite3.OperationalError:
+            self._migrate_to_blob_store()
+        
+        # Check if preview column exists, add previews and sizes if it doesn't
+        try:
+            self.cursor.execute('SELECT preview FROM clipboard_history LIMIT 1')
+        except sqlite3.OperationalError:
+            self._migrate_to_stored_previews()
+        
+        # Check if codec column exists, add it if it doesn't
+        try:
+            self.cursor.execute('SELECT codec FROM content_blobs LIMIT 1')
+        except sqlite3.OperationalError:
+            self._migrate_to_compressed_storage()
+        
+        # Check if scan_version column exists, add it if it doesn't; existing
+        # rows keep their flags until SensitiveScanner re-scans them
+        try:
+            self.cursor.execute('SELECT scan_version FROM clipboard_history LIMIT 1')
+        except sqlite3.OperationalError:
+            print("Adding scan_version column...")
+            self.cursor.execute('ALTER TABLE clipboard_history ADD COLUMN scan_version INTEGER')
+        
+        # Check if chunked column exists, add it if it doesn't
+        try:
+            self.cursor.execute('SELECT chunked FROM content_blobs LIMIT 1')
+        except sqlite3.OperationalError:
+            print("Adding chunked column...")
+            self.cursor.execute('ALTER TABLE content_blobs ADD COLUMN chunked BOOLEAN DEFAULT 0')
+        
+        # Check if encrypted column exists, add it if it doesn't
+        try:
+            self.cursor.execute('SELECT encrypted FROM content_blobs LIMIT 1')
+        except sqlite3.OperationalError:
+            self._migrate_to_encrypted_storage()
+        
+        # The item counters are counted once; their triggers, created with
+        # the rest of the schema, keep them from here
+        self.cursor.execute('''
+            INSERT OR IGNORE INTO history_counts (id, total, unpinned)
+            SELECT 0, COUNT(*), COALESCE(SUM(is_pinned = 0), 0) FROM clipboard_history
+        ''')
+        
+    def _migrate_to_blob_store(self):
+        """Move inline content into content_blobs, one copy per distinct payload."""
+        print("Migrating database to content-addressed storage...")
+        self.cursor.execute('ALTER TABLE clipboard_history ADD COLUMN content_digest BLOB')
+        
+        # The search index triggers read new.content, which is about to become NULL
+        for trigger in ("history_fts_insert", "history_fts_delete", "history_fts_update"):
+            self.cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        
+        # Rows without content can't be shown or copied, so they are dropped
+        self.cursor.execute('DELETE FROM clipboard_history WHERE content IS NULL')
+        
+        self.cursor.execute('SELECT COUNT(*) FROM clipboard_history')
+        total = self.cursor.fetchone()[0]
+        done = last_id = 0
+        while True:
+            self.cursor.execute('SELECT id, content FROM clipboard_history WHERE id > ? ORDER BY id LIMIT ?',
+                                (last_id, MIGRATION_BATCH_SIZE))
+            rows = self.cursor.fetchall()
+            if not rows:
+                break
+            blobs = []
+            digests = []
+            for item_id, content in rows:
+                if isinstance(content, str):
+                    content = content.encode()
+                digest = content_digest(content)
+                blobs.append((digest, content, len(content)))
+                digests.append((digest, item_id))
+            self.cursor.executemany(
+                'INSERT OR IGNORE INTO content_blobs (digest, content, size) VALUES (?, ?, ?)', blobs
+            )
+            self.cursor.executemany(
+                'UPDATE clipboard_history SET content_digest = ?, content = NULL WHERE id = ?', digests
+            )
+            last_id = rows[-1][0]
+            done += len(rows)
+            report_progress(done, total)
+        
+    def _migrate_to_stored_previews(self):
+        """Store sizes and previews with each row so listing never reads content."""
+        print("Migrating database to add previews...")
+        self.cursor.execute('ALTER TABLE clipboard_history ADD COLUMN preview TEXT')
+        self.cursor.execute('ALTER TABLE clipboard_history ADD COLUMN size INTEGER')
+        
+        # Rows are updated a range of ids at a time, to report progress
+        self.cursor.execute('SELECT MIN(id), MAX(id) FROM clipboard_history')
+        first, last = self.cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, MIGRATION_BATCH_SIZE):
+            end = min(start + MIGRATION_BATCH_SIZE - 1, last)
+            # substr() on TEXT counts characters, so previews never split a UTF-8 sequence.
+            # Images without a thumbnail yet keep a NULL preview until one is generated.
+            self.cursor.execute(f'''
+                UPDATE clipboard_history SET
+                    size = (SELECT size FROM content_blobs WHERE digest = content_digest),
+                    preview = CASE content_type
+                        WHEN 'text' THEN (
+                            SELECT CASE WHEN length(CAST(content AS TEXT)) > {PREVIEW_LENGTH}
+                                THEN substr(CAST(content AS TEXT), 1, {PREVIEW_LENGTH}) || '...'
+                                ELSE CAST(content AS TEXT) END
+                            FROM content_blobs WHERE digest = content_digest)
+                        ELSE (
+                            SELECT 'Image (' || width || 'x' || height || ')'
+                            FROM image_thumbnails WHERE digest = content_digest)
+                    END
+                WHERE id BETWEEN ? AND ?
+            ''', (start, end))
+            report_progress(end - first + 1, last - first + 1)
+        
+    def _migrate_to_compressed_storage(self):
+        """Add the per-blob codec; existing blobs are compressed later by recompress_blobs."""
+        print("Migrating database to add content compression...")
+        self.cursor.execute('ALTER TABLE content_blobs ADD COLUMN codec TEXT')
+        
+        
+    def _migrate_to_encrypted_storage(self):
+        """Add the encrypted flag; existing blobs are encrypted later by encrypt_blobs.
+        
+        The search index held plain text, so it is dropped; rows are indexed
+        again as their blobs are encrypted.
+        """
+        print("Migrating database to encrypted storage...")
+        self.cursor.execute('ALTER TABLE content_blobs ADD COLUMN encrypted BOOLEAN DEFAULT 0')
+        for trigger in ("history_fts_insert", "history_fts_delete", "history_fts_update"):
+            self.cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        self.cursor.execute('DROP TABLE IF EXISTS history_fts')
+        
+    def _migrate_to_item_formats(self):
+        """Record offered formats and store secondary ones (version 1 to 2).
+        
+        item_formats and its triggers are created from schema.sql;
+        content_blobs_gc is dropped so it is created again with the check
+        for blobs that item_formats still references.
+        """
+        self.cursor.execute('ALTER TABLE clipboard_history ADD COLUMN offered_formats TEXT')
+        self.cursor.execute('DROP TRIGGER IF EXISTS content_blobs_gc')
+        
+    def _init_search_index(self, upgraded=False):
+        """Create the full-text and fuzzy search indexes over text items if they are missing.
+        
+        save_item and encrypt_blobs write the indexes, since SQL can't read
+        encrypted content. With encryption they hold blind tokens of word
+        prefixes and word trigrams instead of text. Their triggers are
+        only checked against schema.sql after an upgrade.
+        """
+        try:
+            missing = self._create_search_indexes(upgraded)
+        except sqlite3.OperationalError:
+            # SQLite was built without FTS5; search falls back to a table scan
+            print("FTS5 is not available, using slow search")
+            self.fts_enabled = False
+            return
+        self.fts_enabled = True
+        # (item_id, text) of captures not yet indexed; see index_pending
+        self._unindexed = []
+        
+        # A new database has nothing to index, so its first run stays quiet
+        report = False
+        if missing:
+            self.cursor.execute("SELECT 1 FROM clipboard_history WHERE content_type = 'text' LIMIT 1")
+            report = self.cursor.fetchone() is not None
+        if report:
+            print("Building search index...")
+        # Captures whose indexing was lost when the application stopped are
+        # newer than every indexed row, so only those are looked at; a new
+        # index is built from the start
+        last_ids = {}
+        for name in SEARCH_INDEXES:
+            self.cursor.execute(f'SELECT rowid FROM {name} ORDER BY rowid DESC LIMIT 1')
+            last_ids[name] = (self.cursor.fetchone() or (0,))[0]
+        self._index_stored_items(last_ids, report=report)
+        
+    def _create_search_indexes(self, upgraded=True):
+        """Create the search index tables and triggers of schema.sql the database doesn't have.
+        
+        Unless upgraded, nothing is created while every index table exists.
+        Returns the names of the indexes created.
+        """
+        placeholders = ', '.join('?' * len(SEARCH_INDEXES))
+        self.cursor.execute(f'SELECT COUNT(*) FROM sqlite_master WHERE name IN ({placeholders})', SEARCH_INDEXES)
+        if not upgraded and self.cursor.fetchone()[0] == len(SEARCH_INDEXES):
+            return []
+        self.cursor.execute('SELECT name FROM sqlite_master')
+        existing = {row[0] for row in self.cursor.fetchall()}
+        for statement in schema_statements():
+            match = SCHEMA_OBJECT.search(statement)
+            if match and match.group(2) not in existing and is_search_index_statement(statement):
+                self.cursor.execute(statement)
+        return [name for name in SEARCH_INDEXES if name not in existing]
+        
+    def _index_stored_items(self, last_ids, report=False):
+        """Index the stored text items newer than last_ids[name] in each search index, without committing.
+        
+        Rows with plaintext blobs are indexed by encrypt_blobs as it
+        encrypts them.
+        """
+        last_id = min(last_ids.values())
+        done = 0
+        while True:
+            self.cursor.execute(f'''
+                SELECT h.id, b.codec, b.content, b.chunked, b.digest, b.encrypted
+                FROM {CONTENT_FROM}
+                WHERE h.id > ? AND h.content_type = 'text' AND (b.encrypted OR NOT ?)
+                ORDER BY h.id
+                LIMIT ?
+            ''', (last_id, self.cipher.encrypts, MIGRATION_BATCH_SIZE))
+            rows = self.cursor.fetchall()
+            if not rows:
+                break
+            for item_id, *blob in rows:
+                self._index_items([(item_id, self._indexed_text(*blob))],
+                                  [name for name in SEARCH_INDEXES if item_id > last_ids[name]])
+            last_id = rows[-1][0]
+            done += len(rows)
+            if report:
+                report_progress(done)
+        
+    def _indexed_text(self, codec, content, chunked, digest, encrypted):
+        """Return the part of a stored text payload that is indexed: all of it, or its first chunk."""
+        if chunked:
+            self.cursor.execute('SELECT codec, data FROM content_chunks WHERE digest = ? AND seq = 0', (digest,))
+            codec, content = self.cursor.fetchone()
+            data = self._read_stored(codec, content, encrypted, chunk_associated_data(digest, 0))
+        else:
+            data = self._read_stored(codec, content, encrypted, digest)
+        return bytes(data).decode(errors="replace")
+        
+    def _index_items(self, items, indexes=SEARCH_INDEXES):
+        """Add (item_id, text) text items to the search indexes without committing."""
+        items = list(items)
+        if "history_fts" in indexes:
+            self.cursor.executemany('INSERT INTO history_fts (rowid, body) VALUES (?, ?)',
+                                    [(item_id, self.cipher.search_body(text)) for item_id, text in items])
+        if "history_trigrams" in indexes:
+            self.cursor.executemany(
+                'INSERT INTO history_trigrams (rowid, body) VALUES (?, ?)',
+                [(item_id, " ".join(self.cipher.trigram_tokens(text[:FUZZY_TEXT_LENGTH]))) for item_id, text in items]
+            )
+        
+    def index_pending(self):
+        """Add the text captured since the last call to the search indexes.
+        
+        Building blind tokens costs more than the rest of a capture, so
+        save_item leaves it to this; AsyncDatabase calls it whenever its
+        queue is empty, and search and fuzzy_search call it first. Returns
+        the number of items indexed.
+        """
+        pending, self._unindexed = self._unindexed, []
+        if not pending:
+            return 0
+        # Rows trimmed or deleted since their capture are skipped
+        placeholders = ', '.join('?' * len(pending))
+        self.cursor.execute(f'SELECT id FROM clipboard_history WHERE id IN ({placeholders})',
+                            [item_id for item_id, _ in pending])
+        present = {row[0] for row in self.cursor.fetchall()}
+        with self.conn:
+            self._index_items((item_id, self.sanitize_data(text)) for item_id, text in pending if item_id in present)
+        return len(present)
             
     def is_sensitive_data(self, content):
         """Check if content contains sensitive information."""
-        if isinstance(content, str):
-            # Patterns for sensitive data
-            patterns = [
-                r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # Email
-                r'\b\d{16}\b',  # Credit card
-                r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
-                r'password|secret|key|token|credential',  # Common sensitive words
-                r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b',  # IP address
-                r'api[_-]?key|access[_-]?token|auth[_-]?token',  # API keys
-            ]
-            
-            for pattern in patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    return True
-        return False
+        return is_sensitive(content)
         
     def sanitize_data(self, content):
         """Sanitize data before storage."""
         if isinstance(content, str):
-            # Remove null bytes and other potentially dangerous characters
-            content = content.replace('\0', '')
-            # Remove control characters
-            content = ''.join(char for char in content if ord(char) >= 32 or char == '\n')
+            # Remove null bytes and other control characters
+            content = content.translate(CONTROL_CHARACTERS)
         return content
         
     def enforce_history_limit(self, max_items):
-        """Enforce the maximum history limit by removing oldest unpinned items."""
-        # Get the current count
-        self.cursor.execute('SELECT COUNT(*) FROM clipboard_history')
-        current_count = self.cursor.fetchone()[0]
+        """Remove the oldest unpinned items until at most max_items are left.
         
-        if current_count > max_items:
-            # Calculate how many items to remove
-            items_to_remove = current_count - max_items
-            
-            # Delete the oldest unpinned items
-            self.cursor.execute('''
-                DELETE FROM clipboard_history 
-                WHERE id IN (
-                    SELECT id FROM clipboard_history 
-                    WHERE is_pinned = 0 
-                    ORDER BY timestamp ASC 
-                    LIMIT ?
-                )
-            ''', (items_to_remove,))
-            self.conn.commit()
+        Pinned items don't count toward the limit, since they are never removed.
+        """
+        removed_ids = self._evict_oldest(self._unpinned_count() - max_items)
+        self.conn.commit()
+        self._notify_removed(removed_ids)
+        
+    def trim_history(self, batch_size=TRIM_BATCH_SIZE):
+        """Evict the oldest unpinned items once there are too many, a batch at a time.
+        
+        Nothing is evicted until the unpinned items exceed the
+        max_history_size setting by TRIM_SLACK. From then on each call
+        evicts up to batch_size items, until the limit is reached again.
+        Returns the number of items evicted, so callers can repeat until
+        it is 0. Both checks read the maintained counters, and eviction
+        walks idx_history_order, so neither depends on the history size.
+        """
+        max_items = self.settings.value("max_history_size")
+        unpinned = self._unpinned_count()
+        if unpinned <= max_items:
+            self._trimming = False
+            return 0
+        if not self._trimming and unpinned <= max_items + max(1, int(max_items * TRIM_SLACK)):
+            return 0
+        
+        self._trimming = True
+        with self.conn:
+            removed_ids = self._evict_oldest(min(unpinned - max_items, batch_size))
+        self._notify_removed(removed_ids)
+        return len(removed_ids)
+        
+    def _unpinned_count(self):
+        self.cursor.execute('SELECT unpinned FROM history_counts')
+        return self.cursor.fetchone()[0]
+        
+    def _notify_removed(self, removed_ids):
+        """Tell views about removed rows, if there were any."""
+        if removed_ids:
+            self.items_removed.emit(removed_ids)
+        
+    def _evict_oldest(self, count):
+        """Remove the count oldest unpinned items without committing.
+        
+        Returns the ids of the removed items.
+        """
+        if count <= 0:
+            return []
+        self.cursor.execute('''
+            DELETE FROM clipboard_history 
+            WHERE id IN (
+                SELECT id FROM clipboard_history 
+                WHERE is_pinned = 0 
+                ORDER BY timestamp ASC, id ASC 
+                LIMIT ?
+            )
+            RETURNING id
+        ''', (count,))
+        return [row[0] for row in self.cursor.fetchall()]
             
-    def save_item(self, content_type, content):
-        """Save an item to the database."""
-        # Check if content is sensitive
-        is_sensitive = self.is_sensitive_data(content)
+    def _purge_expired(self, now=None):
+        """Remove unpinned items whose expiration time has passed without committing.
         
-        # Sanitize the content
-        content = self.sanitize_data(content)
+        Returns the ids of the removed items.
+        """
+        now = format_timestamp(now or utc_now())
+        # The unary + keeps SQLite from walking every unpinned row through
+        # idx_history_order instead of the few expired ones in idx_expiration
+        self.cursor.execute('''
+            DELETE FROM clipboard_history 
+            WHERE expiration_time IS NOT NULL 
+            AND expiration_time < ? 
+            AND +is_pinned = 0
+            RETURNING id
+        ''', (now,))
+        return [row[0] for row in self.cursor.fetchall()]
+        
+    def purge_expired(self):
+        """Remove expired unpinned items."""
+        removed_ids = self._purge_expired()
+        self.conn.commit()
+        self._notify_removed(removed_ids)
+
+    def next_expiration(self):
+        """Return the earliest pending expiration time as a naive UTC datetime, or None.
+
+        Pinned items never carry an expiration time, so this is answered from
+        the first entry of idx_expiration without scanning the table.
+        """
+        self.cursor.execute('SELECT MIN(expiration_time) FROM clipboard_history')
+        value = self.cursor.fetchone()[0]
+        if value is None:
+            return None
+        return datetime.fromisoformat(value)
+
+    def count_items(self):
+        """Return the number of items in the history."""
+        self.cursor.execute('SELECT total FROM history_counts')
+        return self.cursor.fetchone()[0]
+
+    def save_item(self, content_type, content, thumbnail=None, formats=None, offered_formats=None,
+                  captured_at=None):
+        """Save an item and return the id of its new row.
         
-        # Convert string content to bytes if needed
+        thumbnail is an image's (png_data, width, height) thumbnail if the
+        caller already decoded it. formats maps MIME types to secondary
+        representations (see clipboard_formats), and offered_formats lists
+        every MIME type the source offered. captured_at is the UTC time of
+        the copy, by default now. Returns None if the content was already
+        stored, and its entry moved to the top instead, or too large to store.
+        """
+        # Oversized text is cut to the limit under the "Truncate" oversize
+        # policy; anything else oversized is rejected
+        max_size = self.settings.value("max_item_size_mb") * 1024 * 1024
+        limit = None
+        digest, size = measure_payload(content, self.cipher.hasher())
+        if size > max_size:
+            if content_type != "text" or self.settings.value("oversize_policy") == "Reject":
+                print(f"Not saving {content_type} of {size} bytes: larger than the {max_size} byte limit")
+                return None
+            limit = max_size
+            digest, size = measure_payload(content, self.cipher.hasher(), limit)
+            
+        preview = None
         if isinstance(content, str):
-            content = content.encode()
+            preview = text_preview(self.sanitize_data(content[:PREVIEW_LENGTH * 2]))
             
-        # Get auto-clear settings
-        settings = QSettings("ClipCache", "Settings")
-        auto_clear = settings.value("auto_clear", False, type=bool)
-        auto_clear_time = settings.value("auto_clear_time", 5, type=int)
-        
-        # Calculate expiration time if auto-clear is enabled
-        expiration_time = None
-        if auto_clear:
+        now = utc_now()
+        expiration_time = self._expiration_time(captured_at or now)
+        timestamp = format_timestamp(captured_at or now)
+        
+        self.cursor.execute(
+            'SELECT id FROM clipboard_history WHERE content_digest = ? ORDER BY timestamp DESC LIMIT 1',
+            (digest,)
+        )
+        existing = self.cursor.fetchone()
+        
+        if existing:
+            item_id = existing[0]
+            # Bump the existing entry, adding the formats it lacks; pinned
+            # entries never expire
+            with self.conn:
+                self.cursor.execute('''
+                    UPDATE clipboard_history
+                    SET timestamp = ?, expiration_time = CASE WHEN is_pinned THEN NULL ELSE ? END
+                    WHERE id = ?
+                ''', (timestamp, expiration_time, item_id))
+                self._store_formats(item_id, formats)
+                removed_ids = self._purge_expired(now)
+                
+            self._notify_removed(removed_ids)
+            self.item_updated.emit(self._get_row(item_id))
+            return None
+        
+        # Decode new images once here so listing never has to
+        if content_type == "image":
+            thumbnail = thumbnail or make_thumbnail(content)
+            preview = f"Image ({thumbnail[1]}x{thumbnail[2]})" if thumbnail else "[Image]"
+        
+        # Insert and purge in a single transaction so a capture costs one commit.
+        # The payload is encoded, encrypted and written a chunk at a time, so a
+        # capture holds at most a chunk of copies besides the content itself.
+        # The row starts unflagged; SensitiveScanner scans text off the capture
+        # path, and trim_history trims the history to its limit later.
+        with self.conn:
+            self._store_payload(digest, size, payload_chunks(content, limit))
+            if thumbnail:
+                self._store_thumbnail(digest, thumbnail, self.cipher.encrypts)
             self.cursor.execute('''
-                SELECT datetime('now', '+' || ? || ' minutes')
-            ''', (auto_clear_time,))
-            expiration_time = self.cursor.fetchone()[0]
+                INSERT INTO clipboard_history
+                    (content_type, content_digest, preview, size, timestamp, is_sensitive, expiration_time,
+                     offered_formats)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (content_type, digest, self.cipher.seal_preview(preview), size, timestamp, False, expiration_time,
+                  "\n".join(offered_formats) if offered_formats else None))
+            item_id = self.cursor.lastrowid
+            self._store_formats(item_id, formats)
+            if content_type == "text" and self.fts_enabled:
+                # Indexed later, by index_pending; chunked payloads by their first chunk
+                self._unindexed.append((item_id, content[:CHUNK_SIZE]))
+            removed_ids = self._purge_expired(now)
+            
+        self._notify_removed(removed_ids)
+        self.item_added.emit((item_id, content_type, preview, timestamp, False, False, expiration_time, size))
+        return item_id
         
-        self.cursor.execute('''
-            INSERT INTO clipboard_history (content_type, content, is_sensitive, expiration_time)
-            VALUES (?, ?, ?, ?)
-        ''', (content_type, content, is_sensitive, expiration_time))
-        self.conn.commit()
+    def _store_payload(self, digest, size, chunks):
+        """Store a payload in content_blobs, unless it is already there, without committing."""
+        if size > CHUNK_SIZE:
+            self._store_chunks(digest, size, chunks)
+            return
+        # Large text compresses well; size stays the uncompressed length
+        codec, stored = compress(b"".join(chunks))
+        self.cursor.execute(
+            'INSERT OR IGNORE INTO content_blobs (digest, content, size, codec, encrypted) VALUES (?, ?, ?, ?, ?)',
+            (digest, self.cipher.encrypt(stored, digest), size, codec, self.cipher.encrypts)
+        )
+        
+    def _store_formats(self, item_id, formats):
+        """Store the secondary formats an item doesn't have yet without committing.
         
-        # Get the maximum history size from settings
-        max_history_size = settings.value("max_history_size", 100, type=int)
+        Each format is a payload like any other, so identical ones are
+        stored once however many items have them.
+        """
+        for mime_type, data in (formats or {}).items():
+            self.cursor.execute('SELECT 1 FROM item_formats WHERE item_id = ? AND mime_type = ?', (item_id, mime_type))
+            if self.cursor.fetchone():
+                continue
+            digest, size = measure_payload(data, self.cipher.hasher())
+            self._store_payload(digest, size, payload_chunks(data))
+            self.cursor.execute('INSERT INTO item_formats (item_id, mime_type, digest) VALUES (?, ?, ?)',
+                                (item_id, mime_type, digest))
+            
+    def _store_chunks(self, digest, size, chunks):
+        """Store a large payload as content_chunks rows without committing."""
+        self.cursor.execute(
+            'INSERT OR IGNORE INTO content_blobs (digest, content, size, codec, chunked, encrypted) VALUES (?, ?, ?, ?, 1, ?)',
+            (digest, b"", size, RAW, self.cipher.encrypts)
+        )
+        if self.cursor.rowcount == 0:
+            return
+        for seq, chunk in enumerate(chunks):
+            codec, stored = compress(chunk)
+            self.cursor.execute('INSERT INTO content_chunks (digest, seq, codec, data) VALUES (?, ?, ?, ?)',
+                                (digest, seq, codec, self.cipher.encrypt(stored, chunk_associated_data(digest, seq))))
+            
+    def _read_stored(self, codec, data, encrypted, associated_data):
+        """Return the original bytes of one stored blob or chunk."""
+        if encrypted:
+            data = self.cipher.decrypt(data, associated_data)
+        return decompress(codec, data)
+            
+    def _load_content(self, codec, content, chunked, digest, size, encrypted):
+        """Return a stored payload, reassembling chunked ones into a single buffer."""
+        if not chunked:
+            return self._read_stored(codec, content, encrypted, digest)
+        buffer = bytearray(size)
+        position = 0
+        for chunk in self._content_chunks(codec, content, chunked, digest, encrypted):
+            buffer[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        return buffer
         
-        # Enforce the history limit
-        self.enforce_history_limit(max_history_size)
+    def _content_chunks(self, codec, content, chunked, digest, encrypted):
+        """Yield the original bytes of a stored payload a chunk at a time."""
+        if not chunked:
+            yield self._read_stored(codec, content, encrypted, digest)
+            return
+        for seq, chunk_codec, data in self.conn.execute(
+                'SELECT seq, codec, data FROM content_chunks WHERE digest = ? ORDER BY seq', (digest,)):
+            yield self._read_stored(chunk_codec, data, encrypted, chunk_associated_data(digest, seq))
         
     def get_item(self, item_id):
-        """Retrieve an item from the database."""
-        self.cursor.execute('SELECT content_type, content FROM clipboard_history WHERE id = ?', (item_id,))
+        """Retrieve an item's full content from the database.
+        
+        Content is decrypted here, on demand, so listing never pays for it.
+        """
+        self.cursor.execute(f'''
+            SELECT h.content_type, b.codec, b.content, b.chunked, b.digest, b.size, b.encrypted
+            FROM {CONTENT_FROM} WHERE h.id = ?
+        ''', (item_id,))
         row = self.cursor.fetchone()
         
         if row:
-            content_type, content = row
-            return content_type, content
+            content_type = row[0]
+            return content_type, self._load_content(*row[1:])
         return None, None
         
+    def get_formats(self, item_id):
+        """Return {mime_type: data} of the secondary formats stored with an item.
+        
+        Like content, they are read and decrypted only when asked for, when
+        the item is copied back.
+        """
+        self.cursor.execute('''
+            SELECT f.mime_type, b.codec, b.content, b.chunked, b.digest, b.size, b.encrypted
+            FROM item_formats f JOIN content_blobs b ON b.digest = f.digest
+            WHERE f.item_id = ?
+        ''', (item_id,))
+        return {row[0]: bytes(self._load_content(*row[1:])) for row in self.cursor.fetchall()}
+        
     def delete_item(self, item_id):
         """Delete an item from the database."""
-        self.cursor.execute('DELETE FROM clipboard_history WHERE id = ?', (item_id,))
-        self.conn.commit()
+        self.delete_items([item_id])
         
-    def clear_history(self, include_pinned=False):
-        """Clear history, optionally including pinned items."""
-        if include_pinned:
-            self.cursor.execute('DELETE FROM clipboard_history')
-        else:
-            self.cursor.execute('DELETE FROM clipboard_history WHERE is_pinned = 0')
-        self.conn.commit()
+    def delete_items(self, item_ids):
+        """Delete items in one statement and transaction.
+        
+        Returns the ids of the items that were deleted; ids of items that
+        no longer exist are ignored.
+        """
+        item_ids = list(item_ids)
+        if not item_ids:
+            return []
+        placeholders = ', '.join('?' * len(item_ids))
+        with self.conn:
+            self.cursor.execute(f'DELETE FROM clipboard_history WHERE id IN ({placeholders}) RETURNING id',
+                                item_ids)
+            removed_ids = [row[0] for row in self.cursor.fetchall()]
+        self._notify_removed(removed_ids)
+        return removed_ids
+        
+    def clear_history(self, include_pinned=False, content_type=None, since=None, until=None):
+        """Clear history, optionally including pinned items.
+        
+        content_type ("text" or "image") limits clearing to one type of
+        item, and since and until (naive UTC datetimes, like utc_now) to
+        items last copied in that range, until excluded. Returns the ids of
+        the removed items.
+        
+        Clearing most of a large history would spend most of its time
+        deleting search index entries, so then the indexes are dropped and
+        built again for the items that are left.
+        """
+        conditions = []
+        parameters = []
+        if not include_pinned:
+            conditions.append('is_pinned = 0')
+        if content_type is not None:
+            conditions.append('content_type = ?')
+            parameters.append(content_type)
+        if since is not None:
+            conditions.append('timestamp >= ?')
+            parameters.append(format_timestamp(since))
+        if until is not None:
+            conditions.append('timestamp < ?')
+            parameters.append(format_timestamp(until))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        rebuild = False
+        if self.fts_enabled:
+            self.cursor.execute(f'''
+                SELECT COALESCE(SUM({' AND '.join(conditions) or 1}), 0), COUNT(*)
+                FROM clipboard_history WHERE content_type = 'text'
+            ''', parameters)
+            removed, total = self.cursor.fetchone()
+            rebuild = (total - removed) * SEARCH_REBUILD_RATIO < removed
+        if rebuild:
+            # Pending captures are indexed with the rest, not after
+            self.index_pending()
+        with self.conn:
+            if rebuild:
+                # The delete triggers find nothing to delete in the new indexes
+                for name in SEARCH_INDEXES:
+                    self.cursor.execute(f'DROP TABLE {name}')
+                self._create_search_indexes()
+            self.cursor.execute(f'DELETE FROM clipboard_history {where} RETURNING id', parameters)
+            removed_ids = [row[0] for row in self.cursor.fetchall()]
+            if rebuild:
+                self._index_stored_items(dict.fromkeys(SEARCH_INDEXES, 0))
+        self._notify_removed(removed_ids)
+        return removed_ids
         
     def get_history(self, limit=500):
-        """Get history items."""
-        # First, remove expired items
-        self.cursor.execute('''
-            DELETE FROM clipboard_history 
-            WHERE expiration_time IS NOT NULL 
-            AND datetime('now') > expiration_time 
-            AND is_pinned = 0
-        ''')
-        self.conn.commit()
+        """Get the first limit history items without their content.
+        
+        Rows are (id, content_type, preview, timestamp, is_pinned,
+        is_sensitive, expiration_time, size); use get_item for the content.
+        Previews are returned as stored, so only those that are displayed
+        need cipher.open_preview.
+        """
+        return self.get_history_page(None, limit)
         
-        # Then get the history, including expiration time
+    def get_history_page(self, before=None, page_size=HISTORY_PAGE_SIZE):
+        """Get the page of history items that follows before.
+        
+        before is the (is_pinned, timestamp, id) of the last row of the
+        previous page, or None for the first page. Rows are in get_history's
+        shape and order. Each page is a range scan of idx_history_order
+        starting at before, so a page deep in the history costs the same
+        as the first, and rows added or removed meanwhile never shift it.
+        """
+        if before is None:
+            # Expired items are removed before a listing starts
+            self.purge_expired()
+            
+            self.cursor.execute(f'''
+                SELECT {HISTORY_COLUMNS}
+                FROM clipboard_history
+                ORDER BY is_pinned DESC, timestamp DESC, id DESC
+                LIMIT ?
+            ''', (page_size,))
+        else:
+            self.cursor.execute(f'''
+                SELECT {HISTORY_COLUMNS}
+                FROM clipboard_history
+                WHERE (is_pinned, timestamp, id) < (?, ?, ?)
+                ORDER BY is_pinned DESC, timestamp DESC, id DESC
+                LIMIT ?
+            ''', (*before, page_size))
+        return self.cursor.fetchall()
+        
+    def search(self, query, limit=50):
+        """Search text items, best matches first.
+        
+        Every word in the query matches as a prefix, so results update
+        sensibly while the user is still typing. Only the newest
+        SEARCH_CANDIDATES matches are ranked, which keeps common terms
+        fast on very large histories. When there are fewer than limit
+        matches, the closest items from fuzzy_search follow, so a typo
+        still finds something. Returns rows of
+        (id, content_type, snippet, timestamp, is_pinned, is_sensitive); the
+        snippet is the decrypted preview, with matched words wrapped in
+        SNIPPET_START and SNIPPET_END.
+        """
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+            
+        if not self.fts_enabled:
+            return self._search_without_index(terms, limit)
+            
+        self.index_pending()
+        match = self.cipher.search_match(terms)
+        if not match:
+            return []
+        # Common terms can match most of the history, and scoring every match is
+        # what makes ranked search slow, so only the newest candidates are scored
         self.cursor.execute('''
-            SELECT id, content_type, content, timestamp, is_pinned, is_sensitive, expiration_time
-            FROM clipboard_history
-            ORDER BY is_pinned DESC, timestamp DESC
+            SELECT h.id, h.content_type, h.preview, h.timestamp, h.is_pinned, h.is_sensitive
+            FROM (
+                SELECT rowid, bm25(history_fts) AS score
+                FROM history_fts
+                WHERE history_fts MATCH ?
+                ORDER BY rowid DESC
+                LIMIT ?
+            ) AS m
+            JOIN clipboard_history h ON h.id = m.rowid
+            ORDER BY m.score
             LIMIT ?
-        ''', (limit,))
+        ''', (match, SEARCH_CANDIDATES, limit))
+        results = [self._search_result(row, terms) for row in self.cursor.fetchall()]
+        if len(results) < limit:
+            found = {row[0] for row in results}
+            results += [row for row in self.fuzzy_search(query, limit) if row[0] not in found][:limit - len(results)]
+        return results
+        
+    def fuzzy_search(self, query, limit=50):
+        """Search text items by their words' trigrams, which tolerates typos.
+        
+        An item's similarity is the share of the query's word trigrams it
+        holds, so "dokcer" still finds "docker". Candidates are the items
+        with the most of those trigrams among the newest FUZZY_POSTINGS
+        entries for them in history_trigrams, and only FUZZY_CANDIDATES
+        of them are scored; like SEARCH_CANDIDATES this keeps queries fast
+        on very large histories, at the cost of old items that share only
+        common trigrams with the query. Matches are ranked by similarity
+        and recency. Returns rows shaped like search's.
+        """
+        terms = re.findall(r'\w+', query)
+        if not terms or not self.fts_enabled:
+            return []
+        self.index_pending()
+        tokens = set(self.cipher.trigram_tokens(query))
+        if not tokens:
+            return []
+            
+        # A trigram whose entries reach the cap is common, and says less
+        # about an item than a rare one
+        per_token = max(FUZZY_POSTINGS // len(tokens), 1)
+        found = Counter()  # trigrams each item is listed for
+        common = Counter()  # the capped ones among them, which count half
+        capped = 0
+        for token in tokens:
+            self.cursor.execute('''
+                SELECT rowid FROM history_trigrams WHERE history_trigrams MATCH ? ORDER BY rowid DESC LIMIT ?
+            ''', (f'"{token}"', per_token))
+            item_ids = [item_id for item_id, in self.cursor.fetchall()]
+            found.update(item_ids)
+            if len(item_ids) == per_token:
+                common.update(item_ids)
+                capped += 1
+        # An item may hold a capped trigram without being listed for it, but
+        # no other; items that can't reach the threshold even so are skipped
+        # before any body is read, which is what a query matching nothing
+        # would otherwise spend its time on
+        needed = FUZZY_THRESHOLD * len(tokens) - capped
+        hits = {item_id: count - common[item_id] / 2 for item_id, count in found.items() if count >= needed}
+        candidates = heapq.nlargest(FUZZY_CANDIDATES, hits, key=hits.get)
+        if not candidates:
+            return []
+            
+        self.cursor.execute(f'''
+            SELECT rowid, body FROM history_trigrams WHERE rowid IN ({', '.join('?' * len(candidates))})
+        ''', candidates)
+        similarity = {}
+        for item_id, body in self.cursor.fetchall():
+            shared = len(tokens.intersection(body.split())) / len(tokens)
+            if shared >= FUZZY_THRESHOLD:
+                similarity[item_id] = shared
+        if not similarity:
+            return []
+        self.cursor.execute(f'''
+            SELECT id, content_type, preview, timestamp, is_pinned, is_sensitive,
+                   julianday('now') - julianday(timestamp)
+            FROM clipboard_history WHERE id IN ({', '.join('?' * len(similarity))})
+        ''', list(similarity))
+        ranked = sorted(self.cursor.fetchall(), reverse=True, key=lambda row: (
+            (1 - RECENCY_WEIGHT) * similarity[row[0]]
+            + RECENCY_WEIGHT * 0.5 ** (max(row[6], 0) / RECENCY_HALF_LIFE_DAYS)))
+        return [self._search_result(row[:6], terms) for row in ranked[:limit]]
+        
+    def _search_result(self, row, terms):
+        """Turn a history row into a search row, with the preview as the snippet."""
+        item_id, content_type, preview, timestamp, is_pinned, is_sensitive = row
+        # The index holds no text to cut a snippet from, so matches are marked in the preview
+        snippet = highlight_terms(self.cipher.open_preview(preview) or "", terms)
+        return item_id, content_type, snippet, timestamp, is_pinned, is_sensitive
+        
+    def _search_without_index(self, terms, limit):
+        """Match previews when FTS5 is unavailable, newest first.
         
-        items = []
+        Content is encrypted, so without an index only previews can be searched.
+        """
+        words = search_words(" ".join(terms))
+        self.cursor.execute('''
+            SELECT id, content_type, preview, timestamp, is_pinned, is_sensitive
+            FROM clipboard_history
+            WHERE content_type = 'text'
+            ORDER BY timestamp DESC
+        ''')
+        results = []
         for row in self.cursor.fetchall():
-            try:
-                item_id, content_type, content, timestamp, is_pinned, is_sensitive, expiration_time = row
-                if content:  # Only process if we have content
-                    items.append((item_id, content_type, content, timestamp, is_pinned, is_sensitive, expiration_time))
-            except Exception as e:
-                print(f"Error processing history item: {e}")
-                continue
-        return items
+            preview = fold(self.cipher.open_preview(row[2]) or "")
+            if all(word in preview for word in words):
+                results.append(self._search_result(row, terms))
+                if len(results) == limit:
+                    break
+        return results
         
     def toggle_pin(self, item_id):
         """Toggle the pinned status of an item and reset expiration time when unpinning."""
-        # First get the current pinned status
         self.cursor.execute('SELECT is_pinned FROM clipboard_history WHERE id = ?', (item_id,))
         current_status = self.cursor.fetchone()
-        
         if current_status:
-            is_pinned = bool(current_status[0])
+            self.set_pinned([item_id], not current_status[0])
+            
+    def set_pinned(self, item_ids, pinned):
+        """Pin or unpin items in one statement and transaction.
+        
+        Pinned items never expire; unpinned ones get a new expiration
+        time if auto-clear is enabled. Returns the ids of the items whose
+        status changed.
+        """
+        item_ids = list(item_ids)
+        if not item_ids:
+            return []
+        expiration_time = None if pinned else self._expiration_time()
+        placeholders = ', '.join('?' * len(item_ids))
+        with self.conn:
+            self.cursor.execute(f'''
+                UPDATE clipboard_history 
+                SET is_pinned = ?, expiration_time = ?
+                WHERE id IN ({placeholders}) AND is_pinned != ?
+                RETURNING {HISTORY_COLUMNS}
+            ''', (int(pinned), expiration_time, *item_ids, int(pinned)))
+            rows = self.cursor.fetchall()
+        for row in rows:
+            self.item_updated.emit(row)
+        return [row[0] for row in rows]
+        
+    def _expiration_time(self, now=None):
+        """Return the expiration time of an unpinned item copied now, or None without auto-clear."""
+        if not self.settings.value("auto_clear"):
+            return None
+        return format_timestamp((now or utc_now()) + timedelta(minutes=self.settings.value("auto_clear_time")))
             
-            # If we're unpinning, reset the expiration time
-            if is_pinned:
-                # Get auto-clear settings
-                settings = QSettings("ClipCache", "Settings")
-                auto_clear = settings.value("auto_clear", False, type=bool)
-                auto_clear_time = settings.value("auto_clear_time", 5, type=int)
+    def _store_thumbnail(self, digest, thumbnail, encrypted):
+        """Store a (data, width, height) thumbnail without committing.
+        
+        Thumbnails are encrypted along with their blob.
+        """
+        data, width, height = thumbnail
+        if encrypted:
+            data = self.cipher.encrypt(data, b"thumbnail" + digest)
+        self.cursor.execute(
+            'INSERT OR REPLACE INTO image_thumbnails (digest, width, height, data) VALUES (?, ?, ?, ?)',
+            (digest, width, height, data)
+        )
+        
+    def get_thumbnail(self, item_id):
+        """Return (png_data, width, height) for an image item, or None."""
+        return self.get_thumbnails([item_id]).get(item_id)
+        
+    def get_thumbnails(self, item_ids):
+        """Return {item_id: (png_data, width, height)} for the image items among item_ids.
+        
+        Images saved before thumbnails existed get one generated and stored
+        the first time it is asked for.
+        """
+        item_ids = list(item_ids)
+        if not item_ids:
+            return {}
+        placeholders = ', '.join('?' * len(item_ids))
+        self.cursor.execute(f'''
+            SELECT h.id, h.content_digest, b.encrypted, t.data, t.width, t.height
+            FROM {CONTENT_FROM}
+            LEFT JOIN image_thumbnails t ON t.digest = h.content_digest
+            WHERE h.id IN ({placeholders}) AND h.content_type = 'image'
+        ''', item_ids)
+        
+        thumbnails = {}
+        missing = []
+        for item_id, digest, encrypted, data, width, height in self.cursor.fetchall():
+            if data is None:
+                missing.append((item_id, digest))
+            else:
+                if encrypted:
+                    data = self.cipher.decrypt(data, b"thumbnail" + digest)
+                thumbnails[item_id] = (data, width, height)
                 
-                # Calculate new expiration time if auto-clear is enabled
-                expiration_time = None
-                if auto_clear:
-                    self.cursor.execute('''
-                        SELECT datetime('now', '+' || ? || ' minutes')
-                    ''', (auto_clear_time,))
-                    expiration_time = self.cursor.fetchone()[0]
+        for item_id, digest in missing:
+            self.cursor.execute('SELECT codec, content, chunked, digest, size, encrypted FROM content_blobs WHERE digest = ?',
+                                (digest,))
+            row = self.cursor.fetchone()
+            thumbnail = make_thumbnail(self._load_content(*row)) if row else None
+            if thumbnail:
+                self._store_thumbnail(digest, thumbnail, row[5])
+                thumbnails[item_id] = thumbnail
+        if missing:
+            self.conn.commit()
+        return thumbnails
+        
+    def unscanned_items(self, version, limit=50):
+        """Return ids of text items not yet scanned with the given rules version."""
+        self.cursor.execute('''
+            SELECT id FROM clipboard_history
+            WHERE content_type = 'text' AND (scan_version IS NULL OR scan_version < ?)
+            LIMIT ?
+        ''', (version, limit))
+        return [row[0] for row in self.cursor.fetchall()]
+        
+    def set_scan_results(self, results, version):
+        """Store (item_id, is_sensitive) scan results and update rows whose flag changed."""
+        results = list(results)
+        if not results:
+            return
+        placeholders = ', '.join('?' * len(results))
+        self.cursor.execute(f'SELECT id, is_sensitive FROM clipboard_history WHERE id IN ({placeholders})',
+                            [item_id for item_id, _ in results])
+        current = dict(self.cursor.fetchall())
+        with self.conn:
+            self.cursor.executemany(
+                'UPDATE clipboard_history SET is_sensitive = ?, scan_version = ? WHERE id = ?',
+                [(flag, version, item_id) for item_id, flag in results]
+            )
+        for item_id, flag in results:
+            if item_id in current and bool(current[item_id]) != flag:
+                self.item_updated.emit(self._get_row(item_id))
                 
-                # Update both pinned status and expiration time
-                self.cursor.execute('''
-                    UPDATE clipboard_history 
-                    SET is_pinned = 0, expiration_time = ?
-                    WHERE id = ?
-                ''', (expiration_time, item_id))
+    def recompress_blobs(self, batch_size=50):
+        """Compress one batch of blobs stored before compression existed.
+        
+        Returns the number of blobs looked at; call again until it returns 0.
+        Working in small batches keeps other requests from waiting behind it.
+        """
+        self.cursor.execute('SELECT digest, content FROM content_blobs WHERE codec IS NULL LIMIT ?', (batch_size,))
+        rows = self.cursor.fetchall()
+        with self.conn:
+            for digest, content in rows:
+                codec, stored = compress(content)
+                self.cursor.execute('UPDATE content_blobs SET codec = ?, content = ? WHERE digest = ?',
+                                    (codec, stored, digest))
+        return len(rows)
+
+    def encrypt_blobs(self, batch_size=50):
+        """Encrypt one batch of blobs stored before encryption existed.
+        
+        Returns the number of blobs encrypted; call again until it returns 0.
+        Nothing is encrypted when the cryptography package is missing.
+        """
+        if not self.cipher.encrypts:
+            return 0
+        self.cursor.execute('''
+            SELECT digest, content, codec, chunked, size FROM content_blobs WHERE NOT encrypted LIMIT ?
+        ''', (batch_size,))
+        rows = self.cursor.fetchall()
+        with self.conn:
+            for row in rows:
+                self._encrypt_blob(*row)
+        return len(rows)
+        
+    def _encrypt_blob(self, old_digest, content, codec, chunked, size):
+        """Replace a plaintext blob with an encrypted one without committing.
+        
+        The blob moves to its keyed digest along with its chunks and
+        thumbnail; the rows referring to it get sealed previews and are
+        indexed again with blind tokens.
+        """
+        plaintext_chunks = 'SELECT seq, codec, data FROM content_chunks WHERE digest = ? ORDER BY seq'
+        hasher = self.cipher.hasher()
+        if chunked:
+            for _, chunk_codec, data in self.conn.execute(plaintext_chunks, (old_digest,)):
+                hasher.update(decompress(chunk_codec, data))
+        else:
+            hasher.update(decompress(codec, content))
+            # A NULL codec means recompress_blobs hasn't looked at the blob yet
+            if codec is None:
+                codec, content = compress(content)
+        digest = hasher.digest()
+        
+        self.cursor.execute('SELECT 1 FROM content_blobs WHERE digest = ?', (digest,))
+        if self.cursor.fetchone() is None:
+            if chunked:
+                self.cursor.execute(
+                    'INSERT INTO content_blobs (digest, content, size, codec, chunked, encrypted) VALUES (?, ?, ?, ?, 1, 1)',
+                    (digest, b"", size, RAW)
+                )
+                self.cursor.executemany(
+                    'INSERT INTO content_chunks (digest, seq, codec, data) VALUES (?, ?, ?, ?)',
+                    ((digest, seq, chunk_codec, self.cipher.encrypt(data, chunk_associated_data(digest, seq)))
+                     for seq, chunk_codec, data in self.conn.execute(plaintext_chunks, (old_digest,)))
+                )
             else:
-                # If we're pinning, just update the pinned status
+                self.cursor.execute(
+                    'INSERT INTO content_blobs (digest, content, size, codec, encrypted) VALUES (?, ?, ?, ?, 1)',
+                    (digest, self.cipher.encrypt(content, digest), size, codec)
+                )
+            self.cursor.execute('SELECT data, width, height FROM image_thumbnails WHERE digest = ?', (old_digest,))
+            thumbnail = self.cursor.fetchone()
+            if thumbnail:
+                self._store_thumbnail(digest, thumbnail, True)
+        
+        self.cursor.execute('''
+            UPDATE clipboard_history SET content_digest = ? WHERE content_digest = ?
+            RETURNING id, content_type, preview
+        ''', (digest, old_digest))
+        text = None
+        for item_id, content_type, preview in self.cursor.fetchall():
+            if isinstance(preview, str):
+                self.cursor.execute('UPDATE clipboard_history SET preview = ? WHERE id = ?',
+                                    (self.cipher.seal_preview(preview), item_id))
+            if content_type == "text" and self.fts_enabled:
+                if text is None:
+                    text = self._indexed_text(codec, content, chunked, old_digest, False)
+                for name in SEARCH_INDEXES:
+                    self.cursor.execute(f'DELETE FROM {name} WHERE rowid = ?', (item_id,))
+                self._index_items([(item_id, text)])
+        
+        # Secondary formats have no preview or index entry to update
+        self.cursor.execute('UPDATE item_formats SET digest = ? WHERE digest = ?', (digest, old_digest))
+        
+        # The GC triggers drop the plaintext chunks and thumbnail along with it
+        self.cursor.execute('DELETE FROM content_blobs WHERE digest = ?', (old_digest,))
+        
+    def export_history(self, path, gzip=True):
+        """Write every item to an archive at path; returns the number of items written.
+        
+        Each item is written with its preview, thumbnail and secondary
+        formats, in the framing of history_archive; content is decrypted,
+        so the archive can be imported under any key. Rows are read one at
+        a time and payloads a chunk at a time, so memory use doesn't depend
+        on the size of the history or of its items. The archive is gzipped
+        unless gzip is False.
+        """
+        count = 0
+        with open_archive(path, "wb", gzip) as archive:
+            write_header(archive)
+            for (item_id, content_type, preview, timestamp, is_pinned, sensitive, expiration_time,
+                 offered_formats, *blob) in self.conn.execute(f'''
+                    SELECT h.id, h.content_type, h.preview, h.timestamp, h.is_pinned, h.is_sensitive,
+                           h.expiration_time, h.offered_formats,
+                           b.codec, b.content, b.chunked, b.digest, b.encrypted
+                    FROM {CONTENT_FROM} ORDER BY h.id
+                '''):
+                digest, encrypted = blob[3], blob[4]
+                self.cursor.execute('SELECT data, width, height FROM image_thumbnails WHERE digest = ?', (digest,))
+                thumbnail = self.cursor.fetchone()
                 self.cursor.execute('''
-                    UPDATE clipboard_history 
-                    SET is_pinned = 1, expiration_time = NULL
-                    WHERE id = ?
+                    SELECT f.mime_type, b.codec, b.content, b.chunked, b.digest, b.encrypted
+                    FROM item_formats f JOIN content_blobs b ON b.digest = f.digest
+                    WHERE f.item_id = ?
                 ''', (item_id,))
+                formats = self.cursor.fetchall()
                 
+                write_metadata(archive, {
+                    "content_type": content_type,
+                    "preview": self.cipher.open_preview(preview),
+                    "timestamp": timestamp,
+                    "is_pinned": bool(is_pinned),
+                    "is_sensitive": bool(sensitive),
+                    "expiration_time": expiration_time,
+                    "offered_formats": offered_formats.split("\n") if offered_formats else None,
+                    "thumbnail_size": list(thumbnail[1:]) if thumbnail else None,
+                    "formats": [row[0] for row in formats],
+                })
+                write_body(archive, self._content_chunks(*blob))
+                if thumbnail:
+                    data = thumbnail[0]
+                    if encrypted:
+                        data = self.cipher.decrypt(data, b"thumbnail" + digest)
+                    write_body(archive, [data])
+                for row in formats:
+                    write_body(archive, self._content_chunks(*row[1:]))
+                count += 1
+        return count
+        
+    def import_history(self, path, batch_size=IMPORT_BATCH_SIZE):
+        """Add the items of an archive written by export_history.
+        
+        Items whose content is already in the history are skipped, as are
+        repeats within the archive. Items are inserted with executemany in
+        transactions of batch_size, and indexed for search as each batch
+        is committed; payloads are spooled to a temporary file while their
+        digest is computed, so memory use doesn't depend on the size of
+        the archive. The history limit applies to imported items like any
+        others. Imported text is scanned for sensitive data again.
+        
+        Returns (imported, skipped). A damaged archive raises ValueError,
+        keeping the batches committed before the damage and rolling back
+        the rest.
+        """
+        imported = skipped = 0
+        batch = []
+        batch_text = 0
+        batch_digests = set()
+        try:
+            with open_archive(path, "rb") as archive:
+                read_header(archive)
+                while True:
+                    metadata = read_metadata(archive)
+                    if metadata is None:
+                        break
+                    with self._spool_body(archive) as (spool, digest, size):
+                        self.cursor.execute('SELECT 1 FROM clipboard_history WHERE content_digest = ?', (digest,))
+                        if self.cursor.fetchone() or digest in batch_digests:
+                            # The rest of the record is read and dropped
+                            for _ in range(bool(metadata["thumbnail_size"]) + len(metadata["formats"])):
+                                for _ in read_body(archive):
+                                    pass
+                            skipped += 1
+                            continue
+                        self._store_payload(digest, size, self._spooled_chunks(spool))
+                        text = None
+                        if metadata["content_type"] == "text" and self.fts_enabled:
+                            # Indexed like save_item indexes chunked text, by its first chunk
+                            spool.seek(0)
+                            text = spool.read(CHUNK_SIZE).decode(errors="replace")
+                        
+                    if metadata["thumbnail_size"]:
+                        width, height = metadata["thumbnail_size"]
+                        self._store_thumbnail(digest, (b"".join(read_body(archive)), width, height), self.cipher.encrypts)
+                    formats = []
+                    for mime_type in metadata["formats"]:
+                        with self._spool_body(archive) as (spool, format_digest, format_size):
+                            self._store_payload(format_digest, format_size, self._spooled_chunks(spool))
+                        formats.append((mime_type, format_digest))
+                    
+                    offered_formats = metadata["offered_formats"]
+                    batch.append(((metadata["content_type"], digest, self.cipher.seal_preview(metadata["preview"]),
+                                   size, metadata["timestamp"], metadata["is_pinned"], metadata["is_sensitive"],
+                                   None if metadata["is_pinned"] else metadata["expiration_time"],
+                                   "\n".join(offered_formats) if offered_formats else None),
+                                  formats, text))
+                    batch_digests.add(digest)
+                    batch_text += len(text or "")
+                    if len(batch) >= batch_size or batch_text >= IMPORT_BATCH_TEXT:
+                        imported += self._insert_imported(batch)
+                        batch, batch_text, batch_digests = [], 0, set()
+            imported += self._insert_imported(batch)
+        except Exception:
+            # Payloads of the unfinished batch would be left with no row pointing to them
+            self.conn.rollback()
+            raise
+        return imported, skipped
+        
+    @contextmanager
+    def _spool_body(self, archive):
+        """Read the next archive body into a temporary file while computing its digest.
+        
+        Gives (spool, digest, size); bodies up to a chunk stay in memory.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE) as spool:
+            hasher = self.cipher.hasher()
+            size = 0
+            for frame in read_body(archive):
+                hasher.update(frame)
+                spool.write(frame)
+                size += len(frame)
+            yield spool, hasher.digest(), size
+        
+    def _spooled_chunks(self, spool):
+        """Yield a spooled payload a chunk at a time."""
+        spool.seek(0)
+        while True:
+            chunk = spool.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+            
+    def _insert_imported(self, batch):
+        """Insert a batch of imported rows, their formats and index entries, and commit.
+        
+        Blobs are already stored in the open transaction. Returns the
+        number of rows inserted.
+        """
+        if not batch:
             self.conn.commit()
+            return 0
+        self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM clipboard_history')
+        last_id = self.cursor.fetchone()[0]
+        self.cursor.executemany('''
+            INSERT INTO clipboard_history
+                (content_type, content_digest, preview, size, timestamp, is_pinned, is_sensitive, expiration_time,
+                 offered_formats)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row for row, _, _ in batch])
+        # AUTOINCREMENT ids only grow, so the batch got the ids above last_id in order
+        self.cursor.execute('SELECT id FROM clipboard_history WHERE id > ? ORDER BY id', (last_id,))
+        item_ids = [row[0] for row in self.cursor.fetchall()]
+        
+        self.cursor.executemany(
+            'INSERT INTO item_formats (item_id, mime_type, digest) VALUES (?, ?, ?)',
+            [(item_id, mime_type, digest)
+             for item_id, (_, formats, _) in zip(item_ids, batch) for mime_type, digest in formats]
+        )
+        if self.fts_enabled:
+            self._index_items((item_id, self.sanitize_data(text))
+                              for item_id, (_, _, text) in zip(item_ids, batch) if text is not None)
+        self.conn.commit()
+        return len(item_ids)
+        
+    def _get_row(self, item_id):
+        """Return a single history row in get_history's shape."""
+        self.cursor.execute(f'SELECT {HISTORY_COLUMNS} FROM clipboard_history WHERE id = ?', (item_id,))
+        return self.cursor.fetchone()
         
     def close(self):
-        """Close the database connection."""
+        """Index pending captures and close the database connection."""
+        if self.fts_enabled:
+            self.index_pending()
         self.conn.close() 
\ No newline at end of file
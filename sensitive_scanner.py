@@ -0,0 +1,123 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Bump whenever RULES or a validator changes; stored rows scanned with an
+# older version are re-scanned in bulk
+RULES_VERSION = 1
+
+# Literal keywords are found by substring search on the lowercased text, which
+# runs at memory speed instead of trying a regex at every position
+KEYWORDS = ("password", "secret", "key", "token", "credential")
+
+# (name, pattern) pairs for the rules that need a regex. Every match starts
+# with a digit or '@', which the pattern consumes first and then checks
+# with lookbehinds, so the combined pattern begins with one character class
+# the re module can skip ahead to. Text is lowercased before matching,
+# which is much faster than IGNORECASE.
+RULES = [
+    # user@host.tld, starting at the '@'
+    ("email", r'(?<=[a-z0-9._%+-]@)[a-z0-9.-]+\.[a-z]{2,}\b'),
+    # 16 digits in groups of four, or 13 to 19 digits in a row
+    ("card", r'(?<!\w\d)(?<=\d)(?:\d{3}[ -](?:\d{4}[ -]){2}\d{4}|\d{12,18})\b'),
+    ("ssn", r'(?<!\w\d)(?<=\d)\d{2}-\d{2}-\d{4}\b'),
+    ("ip_address", r'(?<!\w\d)(?<=\d)\d{0,2}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'),
+]
+
+# Text is scanned in windows of this many characters. Each window is copied
+# and lowercased on its own, so memory is bounded by the window rather than
+# the paste, and other threads can take the GIL between windows.
+CHUNK_SIZE = 1 << 20
+
+# Windows overlap by this much, so matches shorter than it are never split
+MAX_MATCH_LENGTH = 256
+
+# One pattern for all regex rules, so the text is read once; the group that
+# matched names the rule
+_PATTERN = re.compile("[@\\d](?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in RULES) + ")")
+
+def luhn_valid(number):
+    """Return True if the digits of number pass the Luhn checksum."""
+    digits = [int(ch) for ch in number if ch.isdigit()]
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        if position % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+# Extra checks for rules whose pattern alone matches too much
+VALIDATORS = {
+    "card": luhn_valid,
+}
+
+def scan(text):
+    """Return the name of the first rule that matches text, or None."""
+    length = len(text)
+    start = 0
+    while start < length:
+        # One character before the window keeps \b correct at its start
+        context = 1 if start else 0
+        end = min(length, start + CHUNK_SIZE + MAX_MATCH_LENGTH)
+        window = text[start - context:end].lower()
+        if any(keyword in window for keyword in KEYWORDS):
+            return "keyword"
+        for match in _PATTERN.finditer(window, context):
+            # A match touching the window end may continue past it; the next window sees it whole
+            if match.end() == len(window) and end < length:
+                break
+            validator = VALIDATORS.get(match.lastgroup)
+            if validator is None or validator(match.group()):
+                return match.lastgroup
+        start += CHUNK_SIZE
+    return None
+
+def is_sensitive(content):
+    """Return True if text content contains sensitive information."""
+    return isinstance(content, str) and scan(content) is not None
+
+class SensitiveScanner:
+    """Scans stored text items for sensitive data on a background thread.
+
+    New captures are scanned from the text the caller already has; rows
+    scanned with older rules (or never scanned) are re-read and re-scanned
+    in batches by rescan_history. Results go back through
+    set_scan_results, which updates the views for rows whose flag changed.
+    """
+    def __init__(self, db, batch_size=50):
+        self.db = db
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clipcache-scan")
+        self._closed = False
+
+    def scan_item(self, item_id, content):
+        """Scan a just-saved item; a None id (a repeat of stored content) is ignored."""
+        if item_id is not None and not self._closed:
+            self._executor.submit(self._scan_item, item_id, content)
+
+    def rescan_history(self):
+        """Re-scan every text item not yet scanned with RULES_VERSION, a batch at a time."""
+        if not self._closed:
+            self.db.unscanned_items(RULES_VERSION, self.batch_size, callback=self._rescan_batch)
+
+    def _rescan_batch(self, item_ids):
+        if item_ids and not self._closed:
+            self._executor.submit(self._rescan, item_ids)
+
+    def _scan_item(self, item_id, content):
+        self.db.set_scan_results([(item_id, is_sensitive(content))], RULES_VERSION)
+
+    def _rescan(self, item_ids):
+        results = []
+        for item_id in item_ids:
+            # Blocking here is fine: this thread only waits on the database worker
+            content_type, content = self.db.get_item(item_id).result()
+            text = content.decode("utf-8", errors="replace") if content is not None else ""
+            results.append((item_id, is_sensitive(text)))
+        self.db.set_scan_results(results, RULES_VERSION, callback=lambda _: self.rescan_history())
+
+    def shutdown(self):
+        """Stop scanning; call before closing the database."""
+        self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
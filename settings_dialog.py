@@ -1,8 +1,15 @@
+import os
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                             QSpinBox, QCheckBox, QPushButton, QTabWidget,
-                            QWidget, QFormLayout, QComboBox)
-from PyQt5.QtCore import Qt, QSettings
+                            QWidget, QFormLayout, QComboBox, QTreeWidget,
+                            QTreeWidgetItem, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QPalette, QColor
+from metrics import get_metrics
+from settings_store import get_settings_store
+
+# How often the Diagnostics tab is refreshed while the dialog is open
+METRICS_REFRESH_MS = 1000
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -10,7 +17,7 @@ class SettingsDialog(QDialog):
         self.setWindowTitle("ClipCache Settings")
         self.setMinimumWidth(400)
         
-        self.settings = QSettings("ClipCache", "Settings")
+        self.settings = get_settings_store()
         
         layout = QVBoxLayout(self)
         
@@ -26,34 +33,61 @@ class SettingsDialog(QDialog):
         self.history_size = QSpinBox()
         self.history_size.setRange(10, 1000)
         self.history_size.setSingleStep(10)
-        self.history_size.setValue(self.settings.value("max_history_size", 100, type=int))
+        self.history_size.setValue(self.settings.value("max_history_size"))
+        self.history_size.setToolTip("Pinned items don't count toward the limit")
         general_layout.addRow("Maximum history items:", self.history_size)
         
         # Auto-start
         self.auto_start = QCheckBox("Start ClipCache when Windows starts")
-        self.auto_start.setChecked(self.settings.value("auto_start", False, type=bool))
+        self.auto_start.setChecked(self.settings.value("auto_start"))
         general_layout.addRow("Auto-start:", self.auto_start)
         
         # Force to front
         self.force_to_front = QCheckBox("Always keep window on top of other windows")
-        self.force_to_front.setChecked(self.settings.value("force_to_front", False, type=bool))
+        self.force_to_front.setChecked(self.settings.value("force_to_front"))
         general_layout.addRow("Always on top:", self.force_to_front)
         
         # Image capture
         self.image_capture = QCheckBox()
-        self.image_capture.setChecked(self.settings.value("image_capture", True, type=bool))
+        self.image_capture.setChecked(self.settings.value("image_capture"))
         general_layout.addRow("Capture images:", self.image_capture)
         
         # Auto-clear
         self.auto_clear = QCheckBox()
-        self.auto_clear.setChecked(self.settings.value("auto_clear", False, type=bool))
+        self.auto_clear.setChecked(self.settings.value("auto_clear"))
         general_layout.addRow("Auto-clear clipboard:", self.auto_clear)
         
         self.auto_clear_time = QSpinBox()
         self.auto_clear_time.setRange(1, 60)
-        self.auto_clear_time.setValue(self.settings.value("auto_clear_time", 5, type=int))
+        self.auto_clear_time.setValue(self.settings.value("auto_clear_time"))
         general_layout.addRow("Auto-clear after (minutes):", self.auto_clear_time)
         
+        # Largest item that is stored, and what happens to larger ones
+        self.max_item_size = QSpinBox()
+        self.max_item_size.setRange(1, 1024)
+        self.max_item_size.setValue(self.settings.value("max_item_size_mb"))
+        general_layout.addRow("Maximum item size (MB):", self.max_item_size)
+        
+        self.oversize_policy = QComboBox()
+        self.oversize_policy.addItems(["Truncate", "Reject"])
+        self.oversize_policy.setCurrentText(self.settings.value("oversize_policy"))
+        self.oversize_policy.setToolTip("Images larger than the maximum are always rejected")
+        general_layout.addRow("Larger items:", self.oversize_policy)
+        
+        # Bursts of clipboard changes are captured once they settle
+        self.capture_delay = QSpinBox()
+        self.capture_delay.setRange(0, 1000)
+        self.capture_delay.setSingleStep(50)
+        self.capture_delay.setValue(self.settings.value("capture_delay_ms"))
+        self.capture_delay.setToolTip("Changes closer together than this are saved as one item")
+        general_layout.addRow("Capture delay (ms):", self.capture_delay)
+        
+        self.max_captures = QSpinBox()
+        self.max_captures.setRange(1, 100)
+        self.max_captures.setValue(self.settings.value("max_captures_per_second"))
+        self.max_captures.setToolTip("Further changes wait, and only the latest is saved")
+        general_layout.addRow("Maximum captures per second:", self.max_captures)
+        
         tabs.addTab(general_tab, "General")
         
         # Appearance tab
@@ -63,7 +97,7 @@ class SettingsDialog(QDialog):
         # Theme
         self.theme = QComboBox()
         self.theme.addItems(["Light", "Dark", "System"])
-        current_theme = self.settings.value("theme", "System")
+        current_theme = self.settings.value("theme")
         self.theme.setCurrentText(current_theme)
         appearance_layout.addRow("Theme:", self.theme)
         
@@ -79,6 +113,44 @@ class SettingsDialog(QDialog):
         
         tabs.addTab(appearance_tab, "Appearance")
         
+        # Diagnostics tab
+        diagnostics_tab = QWidget()
+        diagnostics_layout = QVBoxLayout(diagnostics_tab)
+        
+        self.collect_metrics = QCheckBox("Collect performance metrics")
+        self.collect_metrics.setChecked(self.settings.value("collect_metrics"))
+        diagnostics_layout.addWidget(self.collect_metrics)
+        
+        self.metrics_view = QTreeWidget()
+        self.metrics_view.setHeaderLabels(["Metric", "Count / value", "p50 (ms)", "p95 (ms)", "Max (ms)"])
+        self.metric_sections = {}
+        self.metric_items = {}
+        for section, title in (("latency", "Latency"), ("counters", "Counters"), ("gauges", "Gauges")):
+            self.metric_sections[section] = QTreeWidgetItem(self.metrics_view, [title])
+            self.metric_sections[section].setExpanded(True)
+        diagnostics_layout.addWidget(self.metrics_view)
+        
+        metrics_buttons = QHBoxLayout()
+        reset_metrics_button = QPushButton("Reset")
+        reset_metrics_button.clicked.connect(self.reset_metrics)
+        save_metrics_button = QPushButton("Save as JSON...")
+        save_metrics_button.clicked.connect(self.save_metrics)
+        metrics_buttons.addStretch()
+        metrics_buttons.addWidget(reset_metrics_button)
+        metrics_buttons.addWidget(save_metrics_button)
+        diagnostics_layout.addLayout(metrics_buttons)
+        
+        tabs.addTab(diagnostics_tab, "Diagnostics")
+        
+        # Gauges fetched from the database arrive after a refresh, so the
+        # tab shows them on the next one
+        self.metrics = get_metrics()
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(METRICS_REFRESH_MS)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+        self.metrics_timer.start()
+        self.refresh_metrics()
+        
         # Buttons
         button_layout = QHBoxLayout()
         
@@ -124,13 +196,59 @@ class SettingsDialog(QDialog):
             """)
             self.theme_preview.setText("System Theme Preview")
         
+    def refresh_metrics(self):
+        """Show the current metrics in the Diagnostics tab."""
+        self.metrics.refresh()
+        snapshot = self.metrics.snapshot()
+        for name, latency in snapshot["latency"].items():
+            self.show_metric("latency", name, [f"{latency['count']:,}"] +
+                             [f"{latency[key]:.2f}" for key in ("p50_ms", "p95_ms", "max_ms")])
+        for name, count in snapshot["counters"].items():
+            self.show_metric("counters", name, [f"{count:,}"])
+        for name, value in snapshot["gauges"].items():
+            self.show_metric("gauges", name, [f"{value:,}" if isinstance(value, int) else str(value)])
+        
+    def show_metric(self, section, name, values):
+        """Update the row of a metric, adding it the first time it is shown."""
+        item = self.metric_items.get((section, name))
+        if item is None:
+            item = self.metric_items[(section, name)] = QTreeWidgetItem(self.metric_sections[section], [name])
+            for column in range(1, self.metrics_view.columnCount()):
+                item.setTextAlignment(column, Qt.AlignRight | Qt.AlignVCenter)
+        for column, value in enumerate(values, 1):
+            item.setText(column, value)
+        
+    def reset_metrics(self):
+        self.metrics.reset()
+        for section in ("latency", "counters"):
+            self.metric_sections[section].takeChildren()
+        self.metric_items = {key: item for key, item in self.metric_items.items() if key[0] == "gauges"}
+        self.refresh_metrics()
+        
+    def save_metrics(self):
+        """Write the current metrics to a JSON file chosen by the user."""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save Metrics", os.path.join(os.path.expanduser("~"), "clipcache-metrics.json"),
+            "JSON files (*.json)")
+        if not path:
+            return
+        try:
+            self.metrics.dump(path)
+        except OSError as e:
+            QMessageBox.warning(self, "ClipCache", f"Could not save metrics: {e}")
+        
     def save_settings(self):
-        self.settings.setValue("max_history_size", self.history_size.value())
-        self.settings.setValue("auto_start", self.auto_start.isChecked())
-        self.settings.setValue("force_to_front", self.force_to_front.isChecked())
-        self.settings.setValue("image_capture", self.image_capture.isChecked())
-        self.settings.setValue("auto_clear", self.auto_clear.isChecked())
-        self.settings.setValue("auto_clear_time", self.auto_clear_time.value())
-        self.settings.setValue("theme", self.theme.currentText())
+        self.settings.set_value("max_history_size", self.history_size.value())
+        self.settings.set_value("auto_start", self.auto_start.isChecked())
+        self.settings.set_value("force_to_front", self.force_to_front.isChecked())
+        self.settings.set_value("image_capture", self.image_capture.isChecked())
+        self.settings.set_value("auto_clear", self.auto_clear.isChecked())
+        self.settings.set_value("auto_clear_time", self.auto_clear_time.value())
+        self.settings.set_value("max_item_size_mb", self.max_item_size.value())
+        self.settings.set_value("oversize_policy", self.oversize_policy.currentText())
+        self.settings.set_value("capture_delay_ms", self.capture_delay.value())
+        self.settings.set_value("max_captures_per_second", self.max_captures.value())
+        self.settings.set_value("theme", self.theme.currentText())
+        self.settings.set_value("collect_metrics", self.collect_metrics.isChecked())
         
         self.accept() 
\ No newline at end of file
@@ -0,0 +1,60 @@
+from PyQt5.QtCore import QObject, QSettings, pyqtSignal
+
+# Every setting ClipCache uses, with its default; the default also fixes the type
+DEFAULTS = {
+    "max_history_size": 100,
+    "auto_start": False,
+    "force_to_front": False,
+    "image_capture": True,
+    "auto_clear": False,
+    "auto_clear_time": 5,
+    "theme": "System",
+    "max_item_size_mb": 64,
+    "oversize_policy": "Truncate",  # or "Reject"
+    "capture_delay_ms": 100,
+    "max_captures_per_second": 10,
+    "collect_metrics": True,
+}
+
+class SettingsStore(QObject):
+    """Process-wide, in-memory view of the application settings.
+
+    QSettings is read once at construction. After that, reads are plain
+    dictionary lookups, and writes go through set_value, which persists the
+    value and emits changed(key, value) so subscribers can react.
+    """
+    changed = pyqtSignal(str, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._settings = QSettings("ClipCache", "Settings")
+        self._values = {
+            key: self._settings.value(key, default, type=type(default))
+            for key, default in DEFAULTS.items()
+        }
+
+    def value(self, key):
+        """Return the cached value of a setting."""
+        return self._values[key]
+
+    def set_value(self, key, value):
+        """Persist a setting and notify subscribers if it changed."""
+        value = type(DEFAULTS[key])(value)
+        if self._values[key] == value:
+            return
+        self._values[key] = value
+        self._settings.setValue(key, value)
+        self.changed.emit(key, value)
+
+    def sync(self):
+        """Flush pending writes to permanent storage."""
+        self._settings.sync()
+
+_store = None
+
+def get_settings_store():
+    """Return the shared SettingsStore, creating it on first use."""
+    global _store
+    if _store is None:
+        _store = SettingsStore()
+    return _store
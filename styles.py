@@ -24,26 +24,26 @@ def get_light_stylesheet():
         background-color: #ffffff;
     }
     
-    QListWidget {
+    QListView {
         border: 1px solid #e0e0e0;
         border-radius: 8px;
         background-color: white;
         padding: 4px;
     }
     
-    QListWidget::item {
+    QListView::item {
         padding: 12px;
         margin: 2px 0;
         border-radius: 6px;
         border: none;
     }
     
-    QListWidget::item:selected {
+    QListView::item:selected {
         background-color: #e3f2fd;
         color: #1976D2;
     }
     
-    QListWidget::item:hover {
+    QListView::item:hover {
         background-color: #f5f5f5;
     }
     
@@ -192,26 +192,26 @@ def get_dark_stylesheet():
         background-color: #333333;
     }
     
-    QListWidget {
+    QListView {
         border: 1px solid #404040;
         border-radius: 8px;
         background-color: #2d2d2d;
         padding: 4px;
     }
     
-    QListWidget::item {
+    QListView::item {
         padding: 12px;
         margin: 2px 0;
         border-radius: 6px;
         border: none;
     }
     
-    QListWidget::item:selected {
+    QListView::item:selected {
         background-color: #0D47A1;
         color: #ffffff;
     }
     
-    QListWidget::item:hover {
+    QListView::item:hover {
         background-color: #404040;
     }
     
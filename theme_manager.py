@@ -1,13 +1,14 @@
 from PyQt5.QtGui import QPalette, QColor
-from PyQt5.QtCore import Qt, QSettings
+from PyQt5.QtCore import Qt
 import platform
 from styles import get_light_stylesheet, get_dark_stylesheet
+from settings_store import get_settings_store
 
 class ThemeManager:
     def __init__(self, app):
         self.app = app
-        self.settings = QSettings("ClipCache", "Settings")
-        self.current_theme = self.settings.value("theme", "System")
+        self.settings = get_settings_store()
+        self.current_theme = self.settings.value("theme")
         
         # Define color schemes
         self.light_theme = {
@@ -48,7 +49,7 @@ class ThemeManager:
     def apply_theme(self, theme_name):
         """Apply the specified theme to the application."""
         self.current_theme = theme_name
-        self.settings.setValue("theme", theme_name)
+        self.settings.set_value("theme", theme_name)
         
         if theme_name == "System":
             # Check if system is using dark mode
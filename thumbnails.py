@@ -0,0 +1,28 @@
+from PyQt5.QtCore import Qt, QByteArray, QBuffer, QIODevice
+from PyQt5.QtGui import QImage
+
+THUMBNAIL_SIZE = 64
+
+def make_thumbnail(content):
+    """Decode image data once and return (png_bytes, width, height) of a thumbnail.
+
+    Uses QImage rather than QPixmap so it is safe to call off the GUI thread.
+    Returns None if the data can't be decoded.
+    """
+    image = QImage()
+    if not image.loadFromData(content):
+        return None
+    return image_thumbnail(image)
+
+def image_thumbnail(image):
+    """Return (png_bytes, width, height) of a thumbnail for a decoded QImage."""
+    thumbnail = image.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return encode_png(thumbnail), image.width(), image.height()
+
+def encode_png(image, quality=-1):
+    """Encode a QImage as PNG; Qt maps a higher quality to less deflate effort."""
+    byte_array = QByteArray()
+    buffer = QBuffer(byte_array)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG", quality)
+    return byte_array.data()